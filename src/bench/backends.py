@@ -0,0 +1,77 @@
+#!/usr/bin/env python3.10
+"""Board with bitboards against the 8x8 list alone, head to head
+
+Times legal move generation over the positions of a few games, then a fixed
+depth search of the same positions, once with each backend.
+
+Run from the source directory: PYTHONPATH=. ./bench/backends.py [depth]
+"""
+import contextlib
+import io
+import sys
+import time
+
+from components import MoveOrder
+from game import Chess
+from transposition import TranspositionTable
+from uci import parse_command
+
+POSITIONS = [
+    "",
+    "e2e4 e7e5 g1f3 b8c6 f1b5 a7a6",
+    "d2d4 d7d5 c2c4 e7e6 b1c3 g8f6 c1g5 f8e7",
+]
+MOVEGEN_ROUNDS = 20
+
+
+def get_moves(position: str):
+    if not position:
+        return []
+    _, moves = parse_command(f"position startpos moves {position}", {})
+    return moves
+
+
+def movegen(position: str, bitboards: bool) -> float:
+    chess = Chess(bitboards=bitboards)
+    chess.play(get_moves(position))
+    player, other_player = chess.players()
+    start = time.monotonic()
+    for _ in range(MOVEGEN_ROUNDS):
+        player.get_possible_moves_index(chess.board, other_player)
+        other_player.get_possible_moves_index(chess.board, player)
+    return time.monotonic() - start
+
+
+def search(position: str, depth: int, bitboards: bool) -> float:
+    tt = TranspositionTable()
+    start = time.monotonic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        Chess(bitboards=bitboards).get_best_move(
+            get_moves(position), {"depth": depth}, tt, MoveOrder()
+        )
+    return time.monotonic() - start
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print(f"seconds, move generation x{MOVEGEN_ROUNDS} and depth {depth}")
+    print("position     list bitboard     list bitboard")
+    totals = [0.0] * 4
+    for number, position in enumerate(POSITIONS):
+        times = [
+            movegen(position, False),
+            movegen(position, True),
+            search(position, depth, False),
+            search(position, depth, True),
+        ]
+        totals = [total + t for total, t in zip(totals, times)]
+        print(f"{number:>8} " + "".join(f"{t:>9.2f}" for t in times))
+    print(
+        "speedup  {:>18.2f} {:>17.2f}".format(
+            totals[0] / totals[1], totals[2] / totals[3]
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
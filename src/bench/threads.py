@@ -0,0 +1,52 @@
+#!/usr/bin/env python3.10
+"""Time to depth of the Lazy SMP search for 1, 2, 4 and 8 workers
+
+Run from the source directory: PYTHONPATH=. ./bench/threads.py [depth]
+"""
+import contextlib
+import io
+import sys
+import time
+
+from components import MoveOrder
+from game import Chess
+from transposition import TranspositionTable
+from uci import parse_command
+
+POSITIONS = [
+    "",
+    "e2e4 e7e5 g1f3 b8c6 f1b5 a7a6",
+    "d2d4 d7d5 c2c4 e7e6 b1c3 g8f6 c1g5 f8e7",
+]
+WORKERS = [1, 2, 4, 8]
+
+
+def time_to_depth(position: str, depth: int, threads: int) -> float:
+    moves = []
+    if position:
+        _, moves = parse_command(f"position startpos moves {position}", {})
+    go = {"depth": depth, "options": {"Threads": threads}}
+    tt = TranspositionTable(shared=threads > 1)
+    try:
+        start = time.monotonic()
+        with contextlib.redirect_stdout(io.StringIO()):
+            Chess().get_best_move(moves, go, tt, MoveOrder())
+        return time.monotonic() - start
+    finally:
+        tt.close()
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    print(f"time to depth {depth}, seconds")
+    print("position " + "".join(f"{n:>9}" for n in WORKERS))
+    totals = [0.0] * len(WORKERS)
+    for number, position in enumerate(POSITIONS):
+        times = [time_to_depth(position, depth, n) for n in WORKERS]
+        totals = [total + t for total, t in zip(totals, times)]
+        print(f"{number:>8} " + "".join(f"{t:>9.2f}" for t in times))
+    print("speedup  " + "".join(f"{totals[0] / t:>9.2f}" for t in totals))
+
+
+if __name__ == "__main__":
+    main()
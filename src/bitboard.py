@@ -0,0 +1,428 @@
+"""Bitboard position: the board as 64-bit integers
+
+Bit n of a bitboard stands for square n, numbered as square() does: A1 is
+0, H1 is 7 and H8 is 63. Each color has one bitboard per kind of piece, plus
+one of everything it occupies. Sets of squares are then whole-board integer
+operations, counted with int.bit_count() and walked lowest bit first.
+
+Sliding pieces look their attacks up by the occupied squares of the line
+they move along, in tables built at import, see line_table(). A rook or a
+bishop takes two lookups, a queen four.
+
+Colors are keyed by Color value and kinds are the constants below, so this
+module depends on nothing else in the engine. Board keeps a Bitboards up to
+date alongside its 8x8 list, see Board.set_index().
+"""
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+PAWN = 0
+KNIGHT = 1
+BISHOP = 2
+ROOK = 3
+QUEEN = 4
+KING = 5
+KINDS = range(6)
+
+# Color values, as in Color
+BLACK = 1
+WHITE = 2
+
+FULL = (1 << 64) - 1
+RANK_1 = 0xFF
+
+# Rank a pawn can still push two squares from
+PAWN_START = {WHITE: RANK_1 << 8, BLACK: RANK_1 << 48}
+
+# Castling, by the bit of the right in Board.castle_rights(): king from and
+# to, squares to be empty, squares not to be attacked
+CASTLING = [
+    (4, 6, 0x60, 0x70),
+    (4, 2, 0x0E, 0x1C),
+    (60, 62, 0x60 << 56, 0x70 << 56),
+    (60, 58, 0x0E << 56, 0x1C << 56),
+]
+CASTLING_COLOR = [WHITE, WHITE, BLACK, BLACK]
+
+KNIGHT_STEPS = [
+    (1, 2),
+    (2, 1),
+    (2, -1),
+    (1, -2),
+    (-1, -2),
+    (-2, -1),
+    (-2, 1),
+    (-1, 2),
+]
+
+# Ray directions, those towards higher squares first
+NORTH, EAST, NORTH_EAST, NORTH_WEST = range(4)
+SOUTH, WEST, SOUTH_WEST, SOUTH_EAST = range(4, 8)
+DIRECTIONS = [
+    (0, 1),
+    (1, 0),
+    (1, 1),
+    (-1, 1),
+    (0, -1),
+    (-1, 0),
+    (-1, -1),
+    (1, -1),
+]
+STRAIGHT = (NORTH, EAST, SOUTH, WEST)
+DIAGONAL = (NORTH_EAST, NORTH_WEST, SOUTH_WEST, SOUTH_EAST)
+
+# Lines through a square, as their two opposite directions
+RANK, FILE, DIAGONAL_LINE, ANTI_DIAGONAL_LINE = range(4)
+LINES = [
+    (EAST, WEST),
+    (NORTH, SOUTH),
+    (NORTH_EAST, SOUTH_WEST),
+    (NORTH_WEST, SOUTH_EAST),
+]
+
+
+def leaper_table(steps: List[Tuple[int, int]]) -> List[int]:
+    """Squares reached in one of steps, from each square"""
+    table = []
+    for sq in range(64):
+        x, y = sq & 7, sq >> 3
+        mask = 0
+        for dx, dy in steps:
+            if 0 <= x + dx < 8 and 0 <= y + dy < 8:
+                mask |= 1 << (y + dy) * 8 + x + dx
+        table.append(mask)
+    return table
+
+
+def ray_table(dx: int, dy: int) -> List[int]:
+    """Squares from each square to the edge of the board, exclusive"""
+    table = []
+    for sq in range(64):
+        x, y = (sq & 7) + dx, (sq >> 3) + dy
+        mask = 0
+        while 0 <= x < 8 and 0 <= y < 8:
+            mask |= 1 << y * 8 + x
+            x, y = x + dx, y + dy
+        table.append(mask)
+    return table
+
+
+KNIGHT_ATTACKS = leaper_table(KNIGHT_STEPS)
+KING_ATTACKS = leaper_table(DIRECTIONS)
+PAWN_ATTACKS = {
+    WHITE: leaper_table([(-1, 1), (1, 1)]),
+    BLACK: leaper_table([(-1, -1), (1, -1)]),
+}
+RAYS = [ray_table(dx, dy) for dx, dy in DIRECTIONS]
+
+
+def between_table() -> List[List[int]]:
+    """Squares strictly between two squares on a line, by both squares,
+    none if they are not on one
+    """
+    table = [[0] * 64 for _ in range(64)]
+    for sq in range(64):
+        for dx, dy in DIRECTIONS:
+            x, y = (sq & 7) + dx, (sq >> 3) + dy
+            mask = 0
+            while 0 <= x < 8 and 0 <= y < 8:
+                table[sq][y * 8 + x] = mask
+                mask |= 1 << y * 8 + x
+                x, y = x + dx, y + dy
+    return table
+
+
+BETWEEN = between_table()
+
+
+def squares(bitboard: int) -> Iterator[int]:
+    """Squares of the set bits, lowest first"""
+    while bitboard:
+        low = bitboard & -bitboard
+        yield low.bit_length() - 1
+        bitboard ^= low
+
+
+def subsets(mask: int) -> Iterator[int]:
+    """All bitboards of squares in mask, starting with none"""
+    subset = 0
+    while True:
+        yield subset
+        subset = (subset - mask) & mask
+        if not subset:
+            break
+
+
+def ray_attacks(sq: int, occupied: int, directions: Tuple[int]) -> int:
+    """Squares a slider on sq reaches along directions, up to and
+    including the first occupied square of each
+
+    Walks the rays to their first blocker, which is how the line tables are
+    built and what they are checked against.
+    """
+    attacks = 0
+    for direction in directions:
+        ray = RAYS[direction][sq]
+        blockers = ray & occupied
+        if blockers:
+            if direction < SOUTH:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= RAYS[direction][blocker]
+        attacks |= ray
+    return attacks
+
+
+def line_table(directions: Tuple[int, int]) -> Tuple[List[int], List[dict]]:
+    """Masks and attacks of the line along directions, by square
+
+    The mask of a square has the squares of the line that can block it,
+    those between it and the edges. Its attacks map every occupancy of the
+    mask to the squares reached, so occupied & mask looks them up.
+    """
+    masks = []
+    table = []
+    for sq in range(64):
+        mask = 0
+        for direction in directions:
+            ray = RAYS[direction][sq]
+            if ray:
+                # Drop the edge square, the last of the ray
+                if direction < SOUTH:
+                    edge = ray.bit_length() - 1
+                else:
+                    edge = (ray & -ray).bit_length() - 1
+                mask |= ray ^ 1 << edge
+        masks.append(mask)
+        table.append(
+            {
+                occupied: ray_attacks(sq, occupied, directions)
+                for occupied in subsets(mask)
+            }
+        )
+    return masks, table
+
+
+LINE_MASKS, LINE_ATTACKS = zip(*(line_table(line) for line in LINES))
+
+
+def rook_attacks(sq: int, occupied: int) -> int:
+    rank = LINE_ATTACKS[RANK][sq][occupied & LINE_MASKS[RANK][sq]]
+    file = LINE_ATTACKS[FILE][sq][occupied & LINE_MASKS[FILE][sq]]
+    return rank | file
+
+
+def bishop_attacks(sq: int, occupied: int) -> int:
+    diagonal = LINE_ATTACKS[DIAGONAL_LINE][sq]
+    anti_diagonal = LINE_ATTACKS[ANTI_DIAGONAL_LINE][sq]
+    return (
+        diagonal[occupied & LINE_MASKS[DIAGONAL_LINE][sq]]
+        | anti_diagonal[occupied & LINE_MASKS[ANTI_DIAGONAL_LINE][sq]]
+    )
+
+
+def attacks(kind: int, color: int, sq: int, occupied: int) -> int:
+    """Squares a piece of kind and color on sq attacks"""
+    if KNIGHT == kind:
+        return KNIGHT_ATTACKS[sq]
+    if KING == kind:
+        return KING_ATTACKS[sq]
+    if PAWN == kind:
+        return PAWN_ATTACKS[color][sq]
+    if BISHOP == kind:
+        return bishop_attacks(sq, occupied)
+    if ROOK == kind:
+        return rook_attacks(sq, occupied)
+    return rook_attacks(sq, occupied) | bishop_attacks(sq, occupied)
+
+
+def other(color: int) -> int:
+    return WHITE if BLACK == color else BLACK
+
+
+class Bitboards:
+    """Piece and occupancy bitboards of a position
+
+    pieces[color][kind] has the squares of color's pieces of kind,
+    occupied[color] all of color's squares.
+    """
+
+    __slots__ = ["pieces", "occupied"]
+
+    def __init__(self):
+        self.pieces: Dict[int, List[int]] = {
+            BLACK: [0] * len(KINDS),
+            WHITE: [0] * len(KINDS),
+        }
+        self.occupied: Dict[int, int] = {BLACK: 0, WHITE: 0}
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, Bitboards)
+            and self.pieces == other.pieces
+            and self.occupied == other.occupied
+        )
+
+    def add(self, color: int, kind: int, sq: int) -> None:
+        bit = 1 << sq
+        self.pieces[color][kind] |= bit
+        self.occupied[color] |= bit
+
+    def remove(self, color: int, kind: int, sq: int) -> None:
+        mask = ~(1 << sq)
+        self.pieces[color][kind] &= mask
+        self.occupied[color] &= mask
+
+    def all(self) -> int:
+        return self.occupied[BLACK] | self.occupied[WHITE]
+
+    def count(self, color: int, kind: int) -> int:
+        return self.pieces[color][kind].bit_count()
+
+    def attacked(self, color: int) -> int:
+        """Squares color attacks, including those of its own pieces"""
+        occupied = self.all()
+        pieces = self.pieces[color]
+        out = 0
+        for kind in KINDS:
+            for sq in squares(pieces[kind]):
+                out |= attacks(kind, color, sq, occupied)
+        return out
+
+    def attackers(self, sq: int, color: int) -> int:
+        """Squares of the pieces of color attacking sq"""
+        pieces = self.pieces[color]
+        occupied = self.all()
+        queens = pieces[QUEEN]
+        return (
+            KNIGHT_ATTACKS[sq] & pieces[KNIGHT]
+            | KING_ATTACKS[sq] & pieces[KING]
+            | PAWN_ATTACKS[other(color)][sq] & pieces[PAWN]
+            | bishop_attacks(sq, occupied) & (pieces[BISHOP] | queens)
+            | rook_attacks(sq, occupied) & (pieces[ROOK] | queens)
+        )
+
+    def least_valuable_attacker(
+        self, sq: int, color: int, occupied: int
+    ) -> Optional[int]:
+        """Square of the cheapest piece of color attacking sq, None if none
+
+        Only pieces on occupied count, sliders see through the other
+        squares, so pieces taken off occupied uncover those behind them.
+        """
+        pieces = self.pieces[color]
+        # Kinds go up in value, the king last
+        for kind in KINDS:
+            if PAWN == kind:
+                reach = PAWN_ATTACKS[other(color)][sq]
+            else:
+                reach = attacks(kind, color, sq, occupied)
+            found = reach & pieces[kind] & occupied
+            if found:
+                return (found & -found).bit_length() - 1
+        return None
+
+    def evasions(self, sq: int, color: int) -> int:
+        """Squares a piece of color other than the king on sq has to move
+        to: all of them out of check, the checker and the squares between
+        it and sq in check, none in double check
+        """
+        checkers = self.attackers(sq, other(color))
+        if not checkers:
+            return FULL
+        if checkers & checkers - 1:
+            return 0
+        return checkers | BETWEEN[sq][checkers.bit_length() - 1]
+
+    def pins(self, sq: int, color: int) -> Dict[int, int]:
+        """Pieces of color pinned to sq, the square of its king, mapped to
+        the squares they can still move to, up to and including the pinner
+        """
+        pieces = self.pieces[other(color)]
+        queens = pieces[QUEEN]
+        snipers = rook_attacks(sq, 0) & (pieces[ROOK] | queens)
+        snipers |= bishop_attacks(sq, 0) & (pieces[BISHOP] | queens)
+        occupied = self.all()
+        pins = {}
+        for sniper in squares(snipers):
+            between = BETWEEN[sq][sniper]
+            blockers = between & occupied
+            # A single blocker of color's is pinned
+            if (
+                blockers
+                and not blockers & blockers - 1
+                and blockers & self.occupied[color]
+            ):
+                pins[blockers.bit_length() - 1] = between | 1 << sniper
+        return pins
+
+    def is_attacked(self, sq: int, color: int) -> bool:
+        """Whether color attacks sq, looking out from sq"""
+        pieces = self.pieces[color]
+        if KNIGHT_ATTACKS[sq] & pieces[KNIGHT]:
+            return True
+        if KING_ATTACKS[sq] & pieces[KING]:
+            return True
+        # A pawn of color attacks sq from where a pawn on sq would attack
+        if PAWN_ATTACKS[other(color)][sq] & pieces[PAWN]:
+            return True
+        occupied = self.all()
+        queens = pieces[QUEEN]
+        if bishop_attacks(sq, occupied) & (pieces[BISHOP] | queens):
+            return True
+        return bool(rook_attacks(sq, occupied) & (pieces[ROOK] | queens))
+
+    def targets(self, color: int, kind: int, sq: int, castling: int) -> int:
+        """Squares the piece of color and kind on sq can move to, the king
+        possibly still in check
+
+        As in the piece classes: pawns push one square, or two from their
+        start, and capture diagonally; the king does not step onto attacked
+        squares and castles with the rights in castling, a bitmask as
+        returned by Board.castle_rights().
+        """
+        own = self.occupied[color]
+        enemy = self.occupied[other(color)]
+        occupied = own | enemy
+        if PAWN == kind:
+            out = PAWN_ATTACKS[color][sq] & enemy
+            step = 8 if WHITE == color else -8
+            push = sq + step
+            if 0 <= push < 64 and not occupied >> push & 1:
+                out |= 1 << push
+                if PAWN_START[color] >> sq & 1 and not (
+                    occupied >> push + step & 1
+                ):
+                    out |= 1 << push + step
+            return out
+        if KING != kind:
+            return attacks(kind, color, sq, occupied) & ~own
+        attacked = self.attacked(other(color))
+        out = KING_ATTACKS[sq] & ~own & ~attacked
+        for right, (src, dst, empty, safe) in enumerate(CASTLING):
+            if (
+                castling >> right & 1
+                and CASTLING_COLOR[right] == color
+                and src == sq
+                and not occupied & empty
+                and not attacked & safe
+            ):
+                out |= 1 << dst
+        return out
+
+    def moves(
+        self, color: int, castling: int = 0, target: int = FULL
+    ) -> List[Tuple[int, int]]:
+        """Pseudo-legal moves of color as from and to squares, only those
+        to squares in target
+        """
+        out = []
+        pieces = self.pieces[color]
+        for kind in KINDS:
+            for src in squares(pieces[kind]):
+                for dst in squares(
+                    self.targets(color, kind, src, castling) & target
+                ):
+                    out.append((src, dst))
+        return out
@@ -1,15 +1,112 @@
+import sys
 import time
 import copy
+import math
 import random
 from enum import Enum, IntEnum
-from typing import Union, List, Any, Tuple
+from typing import Union, List, Any, Tuple, Optional
 from collections import namedtuple
 
+import bitboard
 import uci
+from transposition import (
+    TranspositionTable,
+    BOUND_EXACT,
+    BOUND_LOWER,
+    BOUND_UPPER,
+)
 
 Index = namedtuple("Index", ("x", "y"))
 Position = namedtuple("Position", ("x", "y"))
-INF = 1 << 9
+INF = 32000
+
+# Iterative deepening never goes deeper than this
+MAX_DEPTH = 64
+
+# Depth searched when a go command carries no limits at all
+DEFAULT_DEPTH = 3
+
+# Time management, in seconds unless noted otherwise
+MOVE_OVERHEAD = 0.05
+DEFAULT_MOVES_TO_GO = 30
+
+# Do not start another iteration once this share of the soft limit is gone,
+# the next one would almost certainly not finish in time
+NEW_ITERATION_FRACTION = 0.5
+
+# Soft limit scaling for easy moves and for best moves that keep changing
+EASY_MOVE_SCALE = 0.5
+UNSTABLE_MOVE_SCALE = 1.5
+
+# Nodes between deadline checks
+CHECK_INTERVAL = 64
+
+# Deepest ply the per-ply search tables provide for
+MAX_PLY = 128
+
+# Seconds into a search before the root reports the move it is on
+CURRMOVE_DELAY = 1.0
+
+# Being mated at ply n scores -(MATE - n), so quicker mates score higher.
+# Anything beyond MATE_BOUND is a mate score.
+MATE = 31000
+MATE_BOUND = MATE - MAX_PLY
+
+# Move ordering score bands: hash move, captures that do not lose material
+# (by MVV-LVA), killers, counter moves, quiet moves by history score, which
+# is kept below HISTORY_MAX, and last captures that lose material
+HASH_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 24
+KILLER_SCORE = 1 << 22
+COUNTER_SCORE = KILLER_SCORE - 2
+HISTORY_MAX = 1 << 20
+LOSING_CAPTURE_SCORE = -CAPTURE_SCORE
+
+# Null move pruning: depth reduction R, plus one from NULL_MOVE_DEEP_DEPTH
+# on, not tried below NULL_MOVE_MIN_DEPTH. From NULL_MOVE_VERIFY_DEPTH on a
+# null move cutoff can be double checked with a reduced normal search, see
+# Search.null_verify.
+NULL_MOVE_R = 2
+NULL_MOVE_MIN_DEPTH = 3
+NULL_MOVE_DEEP_DEPTH = 7
+NULL_MOVE_VERIFY_DEPTH = 6
+NULL_MOVE_VERIFY = False
+
+# Late move reductions: quiet moves from the LMR_MIN_MOVES-th on, at depth
+# LMR_MIN_DEPTH and deeper, are searched LMR_TABLE[depth][move number] plies
+# shallower
+LMR_MIN_DEPTH = 3
+LMR_MIN_MOVES = 3
+LMR_TABLE = [
+    [
+        int(0.75 + math.log(depth) * math.log(moves) / 2.25)
+        if depth and moves
+        else 0
+        for moves in range(64)
+    ]
+    for depth in range(MAX_DEPTH + 1)
+]
+
+# Frontier pruning margins, in pawns per ply of remaining depth. See
+# Search.futility_margin and friends, these are the defaults.
+FRONTIER_DEPTH = 3
+FUTILITY_DEPTH = 2
+FUTILITY_MARGIN = 2
+REVERSE_FUTILITY_MARGIN = 2
+RAZOR_DEPTH = 2
+RAZOR_MARGIN = 3
+
+# Captures losing material by static exchange evaluation are not searched
+# this close to the leaves
+SEE_PRUNE_DEPTH = 2
+
+# Aspiration window half-width (in pawns) around the previous iteration's
+# score, doubled on every fail-low or fail-high
+ASPIRATION_WINDOW = 1
+
+# Quiescence search skips captures that cannot lift the score to alpha even
+# with this much (in pawns) to spare
+DELTA_MARGIN = 2
 
 
 class Column(IntEnum):
@@ -136,6 +233,46 @@ def get_other_color(color: Color):
         raise ValueError("Invalid color")
 
 
+# Index of each square, the inverse of square()
+SQUARE_INDEX = [Index(sq & 7, sq >> 3) for sq in range(64)]
+
+
+def index_table(table: List[int]) -> List[Tuple[Index, ...]]:
+    """Bitboards by square as tuples of indices"""
+    return [
+        tuple(SQUARE_INDEX[sq] for sq in bitboard.squares(mask))
+        for mask in table
+    ]
+
+
+# Squares a knight or king reaches and a pawn captures on, by square
+KNIGHT_INDICES = index_table(bitboard.KNIGHT_ATTACKS)
+KING_INDICES = index_table(bitboard.KING_ATTACKS)
+PAWN_CAPTURE_INDICES = {
+    color: index_table(bitboard.PAWN_ATTACKS[color.value]) for color in Color
+}
+
+
+def pawn_pushes(color: Color) -> List[Tuple[Index, ...]]:
+    """Squares a pawn pushes to by square, one ahead then two ahead from
+    its start
+    """
+    step = 1 if Color.WHITE == color else -1
+    start = 1 if Color.WHITE == color else 6
+    table = []
+    for index in SQUARE_INDEX:
+        pushes = ()
+        if 0 <= index.y + step < 8:
+            pushes = (Index(index.x, index.y + step),)
+            if start == index.y:
+                pushes += (Index(index.x, index.y + 2 * step),)
+        table.append(pushes)
+    return table
+
+
+PAWN_PUSH_INDICES = {color: pawn_pushes(color) for color in Color}
+
+
 class Piece:
     """Base class for all pieces
 
@@ -150,6 +287,12 @@ class Piece:
     """
 
     value = None
+
+    # Piece kind in bitboard.Bitboards, None for a bare Piece
+    kind = None
+
+    # Zobrist keys by color and square, see init_zobrist()
+    zobrist = None
     __slots__ = ["index", "color", "has_moved"]
 
     def __init__(self, x: Column, y: Row, color: Color):
@@ -248,6 +391,7 @@ class Piece:
 # TODO: en passante
 class Pawn(Piece):
     value = 1
+    kind = bitboard.PAWN
 
     def __str__(self) -> str:
         return "♙" if self.color == Color.WHITE else "♟︎"
@@ -255,84 +399,29 @@ class Pawn(Piece):
     def get_attacking_moves_index(self, b, *_args) -> List:
         """Attack left or right"""
         moves = []
-        if self.color == Color.BLACK:
-            y_direction = -1
-        else:
-            y_direction = 1
-
-        # attack
-        if (
-            self.is_relative_index_valid(-1, y_direction)
-            and self.get_relative_index(b, -1, y_direction)
-            and self.color
-            is not self.get_relative_index_color(b, -1, y_direction)
-        ):
-            moves.append(Index(self.index.x - 1, self.index.y + y_direction))
-        # attack
-        if (
-            self.is_relative_index_valid(1, y_direction)
-            and self.get_relative_index(b, 1, y_direction)
-            and self.color
-            is not self.get_relative_index_color(b, 1, y_direction)
-        ):
-            moves.append(Index(self.index.x + 1, self.index.y + y_direction))
+        index = self.index
+        for dst in PAWN_CAPTURE_INDICES[self.color][index.y * 8 + index.x]:
+            piece = b.board[dst.x][dst.y]
+            if piece and piece.color is not self.color:
+                moves.append(dst)
         return moves
 
-    def get_defended_moves_index(self, b, *args) -> List[Index]:
+    def get_defended_moves_index(self, b, *args) -> Tuple[Index, ...]:
         """Defend left or right"""
-
-        moves = []
-        if self.color == Color.BLACK:
-            y_direction = -1
-        else:
-            y_direction = 1
-
-        index_l = Index(self.index.x + 1, self.index.y + y_direction)
-        index_r = Index(self.index.x - 1, self.index.y + y_direction)
-
-        # defend
-        if is_index_valid(index_l):
-            moves.append(index_l)
-        # defend
-        if is_index_valid(index_r):
-            moves.append(index_r)
-        return moves
+        index = self.index
+        return PAWN_CAPTURE_INDICES[self.color][index.y * 8 + index.x]
 
     def get_possible_moves_index(
         self, b, player=None, other_player=None
     ) -> List[Index]:
         moves = self.get_attacking_moves_index(b)
-        if self.color == Color.BLACK:
-            y_direction = -1
-        else:
-            y_direction = 1
-
-        # if not blocked, move forward
-        if (
-                self.is_relative_index_valid(0, y_direction) and
-                not self.get_relative_index(b, 0, y_direction)):
-            moves.append(Index(self.index.x, self.index.y + y_direction))
-
-        # if not blocked, move forward
-        if self.color == Color.WHITE:
-            if (
-                1 == self.index.y
-                and not self.get_relative_index(b, 0, y_direction)
-                and not self.get_relative_index(b, 0, 2 * y_direction)
-            ):
-                moves.append(
-                    Index(self.index.x, self.index.y + 2 * y_direction)
-                )
-        else:
-            if (
-                6 == self.index.y
-                and not self.get_relative_index(b, 0, y_direction)
-                and not self.get_relative_index(b, 0, 2 * y_direction)
-            ):
-                moves.append(
-                    Index(self.index.x, self.index.y + 2 * y_direction)
-                )
+        index = self.index
 
+        # if not blocked, move forward, two squares from the start
+        for dst in PAWN_PUSH_INDICES[self.color][index.y * 8 + index.x]:
+            if b.board[dst.x][dst.y]:
+                break
+            moves.append(dst)
         return moves
 
     def promote(self):
@@ -342,43 +431,13 @@ class Pawn(Piece):
 
 class Knight(Piece):
     value = 3
-    __slots__ = ["index", "color", "has_moved", "potential_cache"]
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.potential_cache = None
+    kind = bitboard.KNIGHT
 
     def __str__(self) -> str:
         return "♘" if self.color == Color.WHITE else "♞"
 
-    def move_to_index(self, *args, **kwargs) -> None:
-        super().move_to_index(*args, **kwargs)
-        self.potential_cache = None
-
-    def get_potentials(self) -> List[Index]:
-
-        # caching potentials cuts time in this function by 80%
-        # this function is currently ~6.5% of total runtime
-        if self.potential_cache:
-            return self.potential_cache
-        legal = []
-        x = self.index.x
-        y = self.index.y
-        possible = [
-            Index(x + 1, y + 2),
-            Index(x - 1, y + 2),
-            Index(x - 1, y - 2),
-            Index(x + 1, y - 2),
-            Index(x + 2, y + 1),
-            Index(x - 2, y + 1),
-            Index(x - 2, y - 1),
-            Index(x + 2, y - 1),
-        ]
-        for index in possible:
-            if is_index_valid(index):
-                legal.append(index)
-        self.potential_cache = legal
-        return legal
+    def get_potentials(self) -> Tuple[Index, ...]:
+        return KNIGHT_INDICES[self.index.y * 8 + self.index.x]
 
     def get_possible_moves_index(
         self, b, player=None, other_player=None
@@ -390,7 +449,7 @@ class Knight(Piece):
                 out.append(index)
         return out
 
-    def get_defended_moves_index(self, b, *_args) -> List[Index]:
+    def get_defended_moves_index(self, b, *_args) -> Tuple[Index, ...]:
         return self.get_potentials()
 
 
@@ -552,8 +611,27 @@ def perpendicular(
     return out
 
 
+def slider_moves_index(
+    piece, b, index_type: IndexType = IndexType.ATTACKED
+) -> List[Index]:
+    """Indices a bishop, rook or queen reaches, looked up on b.bitboards
+
+    Like diagonal() and perpendicular(): each line ends on its first piece,
+    included if it is the opponent's, or for DEFENDED whoever's it is.
+    """
+    bitboards = b.bitboards
+    color = piece.color.value
+    targets = bitboard.attacks(
+        piece.kind, color, piece.index.y * 8 + piece.index.x, bitboards.all()
+    )
+    if index_type != IndexType.DEFENDED:
+        targets &= ~bitboards.occupied[color]
+    return [SQUARE_INDEX[sq] for sq in bitboard.squares(targets)]
+
+
 class Bishop(Piece):
     value = 3
+    kind = bitboard.BISHOP
 
     def __str__(self) -> str:
         return "♗" if self.color == Color.WHITE else "♝"
@@ -561,9 +639,13 @@ class Bishop(Piece):
     def get_possible_moves_index(
         self, b, player=None, other_player=None
     ) -> List[Index]:
+        if b.bitboards is not None:
+            return slider_moves_index(self, b)
         return diagonal(b, self.index, self.color, [])
 
     def get_defended_moves_index(self, b, *args) -> List[Index]:
+        if b.bitboards is not None:
+            return slider_moves_index(self, b, IndexType.DEFENDED)
         return diagonal(
             b, self.index, self.color, [], index_type=IndexType.DEFENDED
         )
@@ -571,6 +653,7 @@ class Bishop(Piece):
 
 class Rook(Piece):
     value = 5
+    kind = bitboard.ROOK
 
     def __str__(self) -> str:
         return "♖" if self.color == Color.WHITE else "♜"
@@ -578,9 +661,13 @@ class Rook(Piece):
     def get_possible_moves_index(
         self, b, player=None, other_player=None
     ) -> List[Index]:
+        if b.bitboards is not None:
+            return slider_moves_index(self, b)
         return perpendicular(b, self.index, self.color, [])
 
     def get_defended_moves_index(self, b, *args) -> List[Index]:
+        if b.bitboards is not None:
+            return slider_moves_index(self, b, IndexType.DEFENDED)
         return perpendicular(
             b, self.index, self.color, [], index_type=IndexType.DEFENDED
         )
@@ -588,6 +675,7 @@ class Rook(Piece):
 
 class King(Piece):
     value = 100
+    kind = bitboard.KING
 
     def __str__(self) -> str:
         return "♔" if self.color == Color.WHITE else "♚"
@@ -602,12 +690,20 @@ class King(Piece):
         """
         if other_player.color == self.color:
             raise ValueError("Need opposite player to verify checkness")
-        out = perpendicular(board, self.index, self.color, [], max_depth=2)
-        out = diagonal(board, self.index, self.color, out, max_depth=2)
+        out = self.get_steps(board)
         return list(
             set(out) - set(other_player.get_defended_indices(board, player))
         )
 
+    def get_steps(self, board) -> List[Index]:
+        """Adjacent indices not taken by a piece of the same color"""
+        out = []
+        for dst in KING_INDICES[self.index.y * 8 + self.index.x]:
+            piece = board.board[dst.x][dst.y]
+            if not piece or piece.color != self.color:
+                out.append(dst)
+        return out
+
     def in_check(self, b, player, other_player) -> bool:
         """Verify if king is in check
 
@@ -626,8 +722,7 @@ class King(Piece):
         """
         if other_player.color == self.color:
             raise ValueError("Need opposite player to verify checkness")
-        out = perpendicular(board, self.index, self.color, [], max_depth=2)
-        out = diagonal(board, self.index, self.color, out, max_depth=2)
+        out = self.get_steps(board)
 
         # castle
         if not self.has_moved and not self.in_check(
@@ -733,30 +828,15 @@ class King(Piece):
             set(out) - set(other_player.get_defended_indices(board, player))
         )
 
-    def get_defended_moves_index(self, board, player) -> List[Index]:
+    def get_defended_moves_index(self, board, player) -> Tuple[Index, ...]:
         if player.color == self.color:
             raise ValueError("Need opposite player to verify checkness")
-        out = perpendicular(
-            board,
-            self.index,
-            self.color,
-            [],
-            max_depth=2,
-            index_type=IndexType.DEFENDED,
-        )
-        out = diagonal(
-            board,
-            self.index,
-            self.color,
-            out,
-            max_depth=2,
-            index_type=IndexType.DEFENDED,
-        )
-        return out
+        return KING_INDICES[self.index.y * 8 + self.index.x]
 
 
 class Queen(Piece):
     value = 9
+    kind = bitboard.QUEEN
 
     def __str__(self) -> str:
         return "♕" if self.color == Color.WHITE else "♛"
@@ -764,11 +844,15 @@ class Queen(Piece):
     def get_possible_moves_index(
         self, b, player=None, other_player=None
     ) -> List[Index]:
+        if b.bitboards is not None:
+            return slider_moves_index(self, b)
         out = perpendicular(b, self.index, self.color, [])
         out = diagonal(b, self.index, self.color, out)
         return out
 
     def get_defended_moves_index(self, b, *_args) -> List[Index]:
+        if b.bitboards is not None:
+            return slider_moves_index(self, b, IndexType.DEFENDED)
         out = perpendicular(
             b, self.index, self.color, [], index_type=IndexType.DEFENDED
         )
@@ -792,13 +876,127 @@ piece_notation_to_class = {
 AllPieces = Union[King, Queen, Rook, Bishop, Pawn, Piece]
 
 
+def is_mate_score(score: int) -> bool:
+    return abs(score) >= MATE_BOUND
+
+
+def mate_in(score: int) -> Optional[int]:
+    """Moves to mate, negative if being mated, None if not a mate score"""
+    if score >= MATE_BOUND:
+        return (MATE - score + 1) // 2
+    if score <= -MATE_BOUND:
+        return -((MATE + score) // 2)
+    return None
+
+
+def score_to_tt(score: int, ply: int) -> int:
+    """Mate scores are stored relative to the node, not the root"""
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_tt(score: int, ply: int) -> int:
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def square(index: Index) -> int:
+    """Map index to 0-63, A1 is 0, H1 is 7 and H8 is 63"""
+    return index.y * 8 + index.x
+
+
+# Piece class and value by bitboard kind
+KIND_CLASS = [Pawn, Knight, Bishop, Rook, Queen, King]
+KIND_VALUE = [piece_class.value for piece_class in KIND_CLASS]
+
+
+def encode_move(src: Index, dst: Index, promotion: int = 0) -> int:
+    """Pack a move into 16 bits, 0 (A1 to A1) doubles as no move
+
+    Bits 0-5 are the source square, 6-11 the destination and 12-14 the
+    bitboard kind a pawn promotes to, 0 if none. Castling is the king moving
+    two files, as in do_move(). Moves without promotion fit in 12 bits,
+    which key the MoveOrder tables.
+    """
+    return square(src) | square(dst) << 6 | promotion << 12
+
+
+def decode_move(move: int) -> Tuple[Index, Index]:
+    """Source and destination of move, without the promotion"""
+    return SQUARE_INDEX[move & 63], SQUARE_INDEX[move >> 6 & 63]
+
+
+def uci_str_to_move(move: str) -> int:
+    """Encode a move in UCI notation like encode_move(), ignoring promotion"""
+    src = (ord(move[1]) - ord("1")) * 8 + ord(move[0]) - ord("a")
+    dst = (ord(move[3]) - ord("1")) * 8 + ord(move[2]) - ord("a")
+    return src | dst << 6
+
+
+def init_zobrist(seed: int = 0x5EED) -> None:
+    """Give every piece class 64-bit keys per color and square
+
+    The seed is fixed so that keys agree between runs and processes.
+    """
+    rand = random.Random(seed)
+    for piece_class in (Piece, Pawn, Knight, Bishop, Rook, Queen, King):
+        piece_class.zobrist = {
+            color: [rand.getrandbits(64) for _ in range(64)]
+            for color in Color
+        }
+    global ZOBRIST_BLACK, ZOBRIST_CASTLE
+    ZOBRIST_BLACK = rand.getrandbits(64)
+    ZOBRIST_CASTLE = [rand.getrandbits(64) for _ in CASTLE_SQUARES]
+
+
+# King and rook squares of each castling right
+CASTLE_SQUARES = [
+    (Index(Column.E, Row._1), Index(Column.H, Row._1)),
+    (Index(Column.E, Row._1), Index(Column.A, Row._1)),
+    (Index(Column.E, Row._8), Index(Column.H, Row._8)),
+    (Index(Column.E, Row._8), Index(Column.A, Row._8)),
+]
+ZOBRIST_BLACK: int
+ZOBRIST_CASTLE: List[int]
+
+# Rook move of castling, packed by encode_move(), by the king's destination
+CASTLE_ROOK_MOVES = {
+    6: 7 | 5 << 6,
+    2: 0 | 3 << 6,
+    62: 63 | 61 << 6,
+    58: 56 | 59 << 6,
+}
+init_zobrist()
+
+
 class Board:
-    __slots__ = ["board"]
+    """8x8 board of pieces
 
-    def __init__(self, pieces: List):
+    key is the Zobrist key of the pieces on the board. Every write goes
+    through init_piece(), set_index() or clear_index(), which xor the
+    affected pieces in and out, so do_move() and undo_move() keep it up to
+    date incrementally.
+
+    bitboards mirrors the pieces the same way, see bitboard.Bitboards. Move
+    generation, attack queries and material run on it when it is there.
+    Without it (bitboards=False) Player falls back to walking the 8x8 list,
+    which is kept for comparison, see bench/backends.py.
+    """
+
+    __slots__ = ["board", "key", "bitboards"]
+
+    def __init__(self, pieces: List, bitboards: bool = True):
 
         self.board: List[List]
         self.board = [[None for _ in range(8)] for _ in range(8)]
+        self.key = 0
+        self.bitboards = bitboard.Bitboards() if bitboards else None
         for piece in copy.deepcopy(pieces):
             self.init_piece(piece, piece.index)
 
@@ -817,7 +1015,7 @@ class Board:
 
     def init_piece(self, piece, index: Index):
         index_valid_or_raise(index)
-        self.board[piece.index.x][piece.index.y] = piece
+        self.set_index(piece.index, piece)
 
     def is_index_under_attack(self, player, index: Index, other_player):
         """Attacking indexes are ones which a king may not move into"""
@@ -831,11 +1029,54 @@ class Board:
         return self.board[index.x][index.y]
 
     def set_index(self, index: Index, piece: Piece) -> None:
+        old = self.board[index.x][index.y]
+        sq = index.y * 8 + index.x
+        bitboards = self.bitboards
+        if old:
+            self.key ^= old.zobrist[old.color][sq]
+            if bitboards is not None and old.kind is not None:
+                bitboards.remove(old.color.value, old.kind, sq)
+        self.key ^= piece.zobrist[piece.color][sq]
+        if bitboards is not None and piece.kind is not None:
+            bitboards.add(piece.color.value, piece.kind, sq)
         self.board[index.x][index.y] = piece
 
     def clear_index(self, index: Index) -> None:
+        old = self.board[index.x][index.y]
+        if old:
+            sq = index.y * 8 + index.x
+            self.key ^= old.zobrist[old.color][sq]
+            if self.bitboards is not None and old.kind is not None:
+                self.bitboards.remove(old.color.value, old.kind, sq)
         self.board[index.x][index.y] = None
 
+    def castle_rights(self) -> int:
+        """Castling rights derived from has_moved, bit i for the right of
+        CASTLE_SQUARES[i]
+        """
+        rights = 0
+        for i, (king_index, rook_index) in enumerate(CASTLE_SQUARES):
+            king = self.board[king_index.x][king_index.y]
+            rook = self.board[rook_index.x][rook_index.y]
+            if (
+                isinstance(king, King)
+                and not king.has_moved
+                and isinstance(rook, Rook)
+                and not rook.has_moved
+                and king.color == rook.color
+            ):
+                rights |= 1 << i
+        return rights
+
+    def castle_key(self) -> int:
+        """Zobrist key of the castling rights"""
+        key = 0
+        rights = self.castle_rights()
+        for i, zobrist in enumerate(ZOBRIST_CASTLE):
+            if rights >> i & 1:
+                key ^= zobrist
+        return key
+
     @staticmethod
     def to_color(string: Any, color: str):
         RESET = "\u001b[0m"
@@ -928,6 +1169,14 @@ def indices_to_uci_str(src_index: Index, dst_index: Index) -> str:
     )
 
 
+def move_to_uci_str(move: int) -> str:
+    """UCI notation of a move packed by encode_move()"""
+    promotion = move >> 12 & 7
+    return indices_to_uci_str(*decode_move(move)) + (
+        "nbrq"[promotion - 1] if promotion else ""
+    )
+
+
 def cmd_to_index(cmd: dict):
     """Map command notation to index"""
     file = piece_str_to_column[cmd["file"]]
@@ -935,6 +1184,446 @@ def cmd_to_index(cmd: dict):
     return Index(file, rank)
 
 
+def mvv_lva(board: Board, src: Index, dst: Index) -> int:
+    """Most valuable victim first, least valuable attacker breaks ties"""
+    return (
+        board.board[dst.x][dst.y].value * 128
+        - board.board[src.x][src.y].value
+    )
+
+
+def least_valuable_attacker(
+    squares: List[List], x: int, y: int, color: Color, removed: set
+) -> Optional[Tuple[int, int]]:
+    """Square of the cheapest piece of color attacking (x, y), on the 8x8
+    list of a board without bitboards
+
+    Squares in removed count as empty, so pieces behind them attack
+    through.
+    """
+    best = None
+    best_value = INF
+    sq = y * 8 + x
+
+    # A pawn is as cheap as it gets
+    for index in PAWN_CAPTURE_INDICES[get_other_color(color)][sq]:
+        piece = squares[index.x][index.y]
+        if (
+            isinstance(piece, Pawn)
+            and piece.color == color
+            and (index.x, index.y) not in removed
+        ):
+            return (index.x, index.y)
+
+    for indices, kind in ((KNIGHT_INDICES, Knight), (KING_INDICES, King)):
+        for index in indices[sq]:
+            piece = squares[index.x][index.y]
+            if (
+                isinstance(piece, kind)
+                and piece.color == color
+                and piece.value < best_value
+                and (index.x, index.y) not in removed
+            ):
+                best = (index.x, index.y)
+                best_value = piece.value
+
+    for directions, kinds in (
+        (bitboard.DIAGONAL, (Bishop, Queen)),
+        (bitboard.STRAIGHT, (Rook, Queen)),
+    ):
+        for direction in directions:
+            dx, dy = bitboard.DIRECTIONS[direction]
+            sx, sy = x + dx, y + dy
+            while 0 <= sx < 8 and 0 <= sy < 8:
+                piece = squares[sx][sy]
+                if piece and (sx, sy) not in removed:
+                    if (
+                        isinstance(piece, kinds)
+                        and piece.color == color
+                        and piece.value < best_value
+                    ):
+                        best = (sx, sy)
+                        best_value = piece.value
+                    break
+                sx += dx
+                sy += dy
+    return best
+
+
+def see(board: Board, src: Index, dst: Index) -> int:
+    """Static exchange evaluation of moving src to dst, in pawns
+
+    Both sides keep recapturing on dst with their least valuable attacker,
+    each free to stop when going on would lose material. Pieces uncovered
+    by a capture join in. Nothing is moved on the board.
+    """
+    squares = board.board
+    bitboards = board.bitboards
+    x, y = dst.x, dst.y
+    attacker = squares[src.x][src.y]
+    victim = squares[x][y]
+    colors = (attacker.color, get_other_color(attacker.color))
+
+    gain = [victim.value if victim else 0]
+    on_square = attacker.value
+    # Pieces still in the exchange, as a bitboard or else as the squares
+    # that have left it
+    if bitboards is not None:
+        occupied = bitboards.all() & ~(1 << square(src))
+    removed = {(src.x, src.y)}
+    side = 1
+    while True:
+        if bitboards is None:
+            found = least_valuable_attacker(
+                squares, x, y, colors[side], removed
+            )
+        else:
+            sq = bitboards.least_valuable_attacker(
+                y * 8 + x, colors[side].value, occupied
+            )
+            found = None if sq is None else (sq & 7, sq >> 3)
+        if found is None:
+            break
+        # Speculative gain of capturing what is on the square
+        gain.append(on_square - gain[-1])
+        if max(-gain[-2], gain[-1]) < 0:
+            break
+        on_square = squares[found[0]][found[1]].value
+        if bitboards is None:
+            removed.add(found)
+        else:
+            occupied &= ~(1 << found[1] * 8 + found[0])
+        side ^= 1
+
+    while len(gain) > 1:
+        last = gain.pop()
+        gain[-1] = -max(-gain[-1], last)
+    return gain[0]
+
+
+class MoveOrder:
+    """Move ordering heuristics, learned from beta cutoffs
+
+    Moves are keyed by encode_move() and tables are split by color value:
+
+    killers: the last two quiet moves to cut off at each ply
+    history: butterfly table of cutoff counts, weighted by depth squared,
+        for quiet moves; quiet moves tried before the cutoff are penalised
+    counter: the quiet move that last refuted each opponent move
+
+    The tables outlive a single search: new_search() ages them for the
+    next move, clear() them for a new game.
+    """
+
+    __slots__ = ["killers", "history", "counter"]
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.history = {color.value: [0] * 4096 for color in Color}
+        self.counter = {color.value: [0] * 4096 for color in Color}
+
+    def new_search(self, plies: int) -> None:
+        """Age the tables for a search plies further into the game
+
+        Killers move up by plies, staying with the positions they refuted.
+        History is halved, so what the last search learned only steers the
+        next one until it learns better.
+        """
+        plies = min(plies, MAX_PLY)
+        self.killers = self.killers[plies:] + [
+            [0, 0] for _ in range(plies)
+        ]
+        for table in self.history.values():
+            table[:] = [value // 2 for value in table]
+
+    def sort_moves(
+        self,
+        moves: List[int],
+        board: Board,
+        color: Color,
+        ply: int,
+        hash_move: int = 0,
+        previous: int = 0,
+    ) -> List[int]:
+        """Return moves, packed by encode_move(), sorted best first"""
+        killer_1, killer_2 = self.killers[ply]
+        history = self.history[color.value]
+        counter = self.counter[color.value][previous] if previous else 0
+        squares = board.board
+
+        def score(encoded):
+            src, dst = decode_move(encoded)
+            if encoded == hash_move:
+                return HASH_MOVE_SCORE
+            victim = squares[dst.x][dst.y]
+            if victim:
+                value = mvv_lva(board, src, dst)
+                # Only a cheaper victim can make it a losing capture
+                if victim.value < squares[src.x][src.y].value and (
+                    see(board, src, dst) < 0
+                ):
+                    return LOSING_CAPTURE_SCORE + value
+                return CAPTURE_SCORE + value
+            if encoded == killer_1:
+                return KILLER_SCORE
+            if encoded == killer_2:
+                return KILLER_SCORE - 1
+            if encoded == counter:
+                return COUNTER_SCORE
+            return history[encoded]
+
+        return sorted(moves, key=score, reverse=True)
+
+    def update(
+        self,
+        move: int,
+        tried: List[int],
+        color: Color,
+        depth: int,
+        ply: int,
+        previous: int = 0,
+    ) -> None:
+        """Record that quiet move caused a cutoff after the quiet moves in
+        tried had failed to
+        """
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        if previous:
+            self.counter[color.value][previous] = move
+
+        history = self.history[color.value]
+        bonus = depth * depth
+        history[move] += bonus
+        for other in tried:
+            history[other] = max(history[other] - bonus, -HISTORY_MAX)
+        if history[move] >= HISTORY_MAX:
+            for table in self.history.values():
+                for i, value in enumerate(table):
+                    table[i] = value // 2
+
+
+class Search:
+    """Limits and counters for one search, shared by both players
+
+    Deadlines are measured with time.monotonic(). The soft limit is only
+    consulted between iterations; the hard deadline and the node limit stop
+    the search mid-iteration through the stopped flag, which every node
+    checks before doing any work. So does setting stop_event, an Event
+    polled alongside the deadline.
+
+    With several processes searching (see smp.py), worker numbers them,
+    0 being the main search, and shared_nodes holds each one's node count.
+
+    A ponder search runs without time limits until ponderhit_event is set,
+    then starts the clock with ponder_limits, soft and hard. The time limits
+    count from clock, the start of the search or ponderhit; times reported
+    count from start, as the nodes do.
+
+    At the root, only moves in searchmoves (all if None) and not in
+    excluded are searched. multipv is the number of best lines to find.
+
+    pv_table[ply] is the principal variation found from the node at ply,
+    seldepth the deepest ply reached, quiescence included. pv is the
+    principal variation of the last completed iteration.
+    """
+
+    __slots__ = [
+        "start",
+        "clock",
+        "soft_limit",
+        "deadline",
+        "max_depth",
+        "max_nodes",
+        "nodes",
+        "stopped",
+        "tt",
+        "order",
+        "played",
+        "null_verify",
+        "futility_margin",
+        "reverse_futility_margin",
+        "razor_margin",
+        "worker",
+        "stop_event",
+        "shared_nodes",
+        "ponderhit_event",
+        "ponder_limits",
+        "multipv",
+        "searchmoves",
+        "excluded",
+        "pv_table",
+        "seldepth",
+        "pv",
+    ]
+
+    def __init__(
+        self,
+        depth: int = 0,
+        nodes: int = 0,
+        soft_limit: float = math.inf,
+        hard_limit: float = math.inf,
+        tt: TranspositionTable = None,
+        order: "MoveOrder" = None,
+    ):
+        """
+        param depth: deepest iteration to search, 0 for no limit
+        param nodes: node budget, 0 for no limit
+        param soft_limit: seconds after which no new iteration is started
+        param hard_limit: seconds after which the search is abandoned
+        param tt: transposition table, None searches without one
+        param order: move ordering tables, None creates fresh ones
+        """
+        self.start = self.clock = time.monotonic()
+        self.soft_limit = soft_limit
+        self.deadline = self.start + hard_limit
+        self.max_depth = min(depth, MAX_DEPTH) if depth else MAX_DEPTH
+        self.max_nodes = nodes if nodes else sys.maxsize
+        self.nodes = 0
+        self.stopped = False
+        self.tt = tt
+        if tt is not None:
+            tt.new_search()
+        self.order = MoveOrder() if order is None else order
+
+        # Encoded move played at each ply, for counter moves; 0 below the
+        # root means a null move
+        self.played = [0] * MAX_PLY
+        self.null_verify = NULL_MOVE_VERIFY
+        self.futility_margin = FUTILITY_MARGIN
+        self.reverse_futility_margin = REVERSE_FUTILITY_MARGIN
+        self.razor_margin = RAZOR_MARGIN
+
+        self.worker = 0
+        self.stop_event = None
+        self.shared_nodes = None
+        self.ponderhit_event = None
+        self.ponder_limits = None
+        self.multipv = 1
+        self.searchmoves = None
+        self.excluded = set()
+        self.pv_table = [[] for _ in range(MAX_PLY + 1)]
+        self.seldepth = 0
+        self.pv = []
+
+    @classmethod
+    def from_go(
+        cls,
+        go: dict,
+        color: Color,
+        tt: TranspositionTable = None,
+        order: "MoveOrder" = None,
+    ):
+        """Budget a search from the fields of a UCI go command
+
+        Pruning margins are taken from the UCI options, if go has them.
+        Fixed movetime is used as-is. Otherwise this side's clock is split
+        over the moves left to the time control (a guess under sudden
+        death) plus most of the increment. The hard limit allows unstable
+        iterations to overrun the soft limit without risking the clock.
+        Pondering, the time limits only apply after ponderhit. MultiPV
+        and searchmoves restrict the root.
+        """
+        depth = int(go.get("depth") or 0)
+        nodes = int(go.get("nodes") or 0)
+        movetime = int(go.get("movetime") or 0)
+        if Color.WHITE == color:
+            clock = int(go.get("wtime") or 0)
+            inc = int(go.get("winc") or 0)
+        else:
+            clock = int(go.get("btime") or 0)
+            inc = int(go.get("binc") or 0)
+
+        soft = hard = math.inf
+        if movetime:
+            soft = hard = max(movetime / 1000 - MOVE_OVERHEAD, 0.01)
+        elif go.get("infinite"):
+            pass
+        elif clock:
+            remaining = max(clock / 1000 - MOVE_OVERHEAD, 0.01)
+            moves_to_go = int(go.get("movestogo") or 0) or DEFAULT_MOVES_TO_GO
+            hard = min(
+                3 * (remaining / moves_to_go + 0.75 * inc / 1000),
+                0.8 * remaining,
+            )
+            soft = min(remaining / moves_to_go + 0.75 * inc / 1000, hard)
+        elif not depth and not nodes:
+            depth = DEFAULT_DEPTH
+        search = cls(depth, nodes, soft, hard, tt, order)
+        if go.get("ponder"):
+            search.ponder_limits = (soft, hard)
+            search.soft_limit = search.deadline = math.inf
+
+        options = go.get("options") or {}
+        search.futility_margin = options.get(
+            "FutilityMargin", FUTILITY_MARGIN
+        )
+        search.reverse_futility_margin = options.get(
+            "ReverseFutilityMargin", REVERSE_FUTILITY_MARGIN
+        )
+        search.razor_margin = options.get("RazorMargin", RAZOR_MARGIN)
+        search.multipv = options.get("MultiPV", 1)
+        if go.get("searchmoves"):
+            search.searchmoves = {
+                uci_str_to_move(move) for move in go["searchmoves"]
+            }
+        return search
+
+    def elapsed(self) -> float:
+        """Seconds since the search started"""
+        return time.monotonic() - self.start
+
+    def used(self) -> float:
+        """Seconds on the clock, which pondering doesn't count"""
+        return time.monotonic() - self.clock
+
+    def ponderhit(self) -> None:
+        """The expected move was played, start the clock"""
+        self.soft_limit, hard = self.ponder_limits
+        self.ponder_limits = None
+        self.clock = time.monotonic()
+        self.deadline = self.clock + hard
+
+    def total_nodes(self) -> int:
+        """Nodes searched by all workers"""
+        if self.shared_nodes is None:
+            return self.nodes
+        return self.nodes + sum(self.shared_nodes) - (
+            self.shared_nodes[self.worker]
+        )
+
+    def tick(self) -> bool:
+        """Count a node, return True if the search must stop"""
+        self.nodes += 1
+        if self.nodes >= self.max_nodes:
+            self.stopped = True
+        elif not self.nodes % CHECK_INTERVAL:
+            self.poll()
+        return self.stopped
+
+    def poll(self) -> bool:
+        """Publish the node count, check for ponderhit, the deadline and
+        stop_event; return True if the search must stop
+        """
+        if self.shared_nodes is not None:
+            self.shared_nodes[self.worker] = self.nodes
+        if (
+            self.ponder_limits is not None
+            and self.ponderhit_event is not None
+            and self.ponderhit_event.is_set()
+        ):
+            self.ponderhit()
+        if time.monotonic() >= self.deadline or (
+            self.stop_event is not None and self.stop_event.is_set()
+        ):
+            self.stopped = True
+        return self.stopped
+
+
 class Player:
     """Represents one side, used to track the location of pieces for iterating
     over, rather than iterating over the entire board
@@ -1003,49 +1692,248 @@ class Player:
         return self == other
 
     def in_check(self, b, other_player) -> bool:
+        if b.bitboards is not None:
+            return b.bitboards.is_attacked(
+                square(self.king_index), other_player.color.value
+            )
         return b.get_index(self.king_index).in_check(b, self, other_player)
 
-    def get_best_move(
-            self, board: Board, other_player, depth) -> Tuple[str, int, int]:
-        """Current strategy: material
+    def position_key(self, board: Board) -> int:
+        """Zobrist key of the position with this player to move"""
+        key = board.key ^ board.castle_key()
+        if Color.BLACK == self.color:
+            key ^= ZOBRIST_BLACK
+        return key
 
-        TODO: something is wrong here or in minimax
+    def get_best_move(
+        self, board: Board, other_player, search: Search = None
+    ) -> Tuple[str, int, int, List[Tuple]]:
+        """Iterative deepening over minimax, within the limits of search
+
+        Each iteration starts over one ply deeper, until the depth limit,
+        the soft time limit or the stop flag is reached. The soft limit is
+        shrunk for forced or settled moves and stretched while the best move
+        keeps changing. An iteration interrupted by the stop flag is thrown
+        away, unless it is the first one.
+
+        With search.multipv above 1, each iteration searches the root again
+        for every further line, excluding the first moves of the lines
+        found so far, and reports each line. Only the first line counts for
+        the best move and time management.
+
+        Helper workers only fill the transposition table and report nothing.
+        Odd ones skip the first iteration, to keep a ply ahead of the rest.
         """
-        in_start = time.time()
-
-        best_moves, move_score, count = self.minimax(
-            board, other_player, depth, True
-        )
+        if search is None:
+            search = Search(DEFAULT_DEPTH)
+
+        root_moves = [
+            move
+            for move in self.get_possible_moves_index(board, other_player)
+            if search.searchmoves is None
+            or encode_move(*move) in search.searchmoves
+        ]
+        forced = 1 == len(root_moves)
+        multipv = max(min(search.multipv, len(root_moves)), 1)
+        best_moves: List[Tuple] = []
+        move_score = 0
+        depth = 0
+        stable = 0
+        scale = 1.0
+        for iteration in range(1 + (search.worker & 1), search.max_depth + 1):
+            search.seldepth = 0
+            lines = []
+            for line in range(multipv):
+                if best_moves and not line:
+                    moves, score = self.aspiration_search(
+                        board, other_player, iteration, move_score, search
+                    )
+                else:
+                    moves, score = self.minimax(
+                        board, other_player, iteration, search=search
+                    )
+                if search.stopped and (best_moves or line) or not moves:
+                    break
+                lines.append((moves, score, search.pv_table[0]))
+                search.excluded.add(encode_move(*moves[0]))
+                if search.stopped:
+                    break
+            search.excluded.clear()
+            if search.stopped and best_moves:
+                break
+            if not lines:
+                if not best_moves:
+                    move_score = score
+                break
+            moves, score, search.pv = lines[0]
 
-        in_nps = count / (time.time() - in_start)
-        uci.uci(f"info nps {in_nps:.0f}")
+            if best_moves and set(moves).isdisjoint(best_moves):
+                stable = 0
+                scale = UNSTABLE_MOVE_SCALE
+            else:
+                stable += 1
+                scale = EASY_MOVE_SCALE if stable >= 3 else 1.0
+
+            best_moves = moves
+            move_score = score
+            depth = iteration
+            elapsed = search.elapsed()
+            if not search.worker:
+                nodes = search.total_nodes()
+                hashfull = (
+                    f" hashfull {search.tt.hashfull()}" if search.tt else ""
+                )
+                for line, (moves, score, pv) in enumerate(lines, 1):
+                    uci.uci(
+                        "info depth {} seldepth {}{} score {} nodes {} "
+                        "nps {:.0f}{} time {:.0f} pv {}".format(
+                            depth,
+                            search.seldepth,
+                            f" multipv {line}" if multipv > 1 else "",
+                            uci.score_str(score * 100, mate_in(score)),
+                            nodes,
+                            nodes / max(elapsed, 1e-6),
+                            hashfull,
+                            elapsed * 1000,
+                            " ".join(indices_to_uci_str(*m) for m in pv),
+                        )
+                    )
+            # Only one legal move, no point in thinking about it
+            if search.stopped or forced:
+                break
+            if (
+                search.used()
+                > search.soft_limit * scale * NEW_ITERATION_FRACTION
+            ):
+                break
 
-        # Randomly select from equivalent bestmoves
-        select = random.randrange(len(best_moves))
+        # Stopped before a root move was scored, the table's move is the
+        # best guess there is
+        if not best_moves and root_moves:
+            move = None
+            if search.tt is not None:
+                entry = search.tt.probe(self.position_key(board))
+                if entry and entry[3]:
+                    move = decode_move(entry[3])
+            if move not in root_moves:
+                move = root_moves[0]
+            best_moves = [move]
+            search.pv = [move]
+
+        # Mated or stalemated, nothing to play
+        if not best_moves:
+            return ("0000", move_score, depth, best_moves)
+
+        # Randomly select from equivalent bestmoves, unless analysing
+        select = random.randrange(len(best_moves)) if multipv == 1 else 0
         moves = best_moves[select]
         bestmove = indices_to_uci_str(moves[0], moves[1])
 
-        return (bestmove, move_score, count, best_moves)
+        return (bestmove, move_score, depth, best_moves)
+
+    def aspiration_search(
+        self,
+        board: Board,
+        other_player,
+        depth: int,
+        guess: int,
+        search: Search,
+    ) -> Tuple[List[Tuple], int]:
+        """Search the root with a narrow window around guess
+
+        A result outside the window is only a bound, so the side it fell
+        out of is widened, doubling each time, and the root searched again.
+        """
+        delta = ASPIRATION_WINDOW
+        alpha = guess - delta
+        beta = guess + delta
+        while True:
+            moves, score = self.minimax(
+                board, other_player, depth, alpha, beta, search=search
+            )
+            if search.stopped:
+                return (moves, score)
+            delta *= 2
+            if score <= alpha and alpha > -INF:
+                alpha = max(score - delta, -INF)
+            elif score >= beta and beta < INF:
+                beta = min(score + delta, INF)
+            else:
+                return (moves, score)
+
+    def get_pv(
+        self,
+        board: Board,
+        other_player,
+        move: Tuple[Index, Index],
+        tt: Optional[TranspositionTable],
+        depth: int,
+    ) -> List[Tuple[Index, Index]]:
+        """Principal variation starting with move, up to depth moves long
+
+        After move, follows the best moves stored in tt for as long as they
+        are legal and don't repeat a position.
+        """
+        pv = []
+        undos = []
+        player, opponent = self, other_player
+        seen = set()
+        while move:
+            encoded = encode_move(*move)
+            undo = player.do_move_fast(encoded, board, opponent)
+            if player.in_check(board, opponent):
+                player.undo_move_fast(encoded, board, opponent, undo)
+                break
+            pv.append(move)
+            undos.append((player, opponent, encoded, undo))
+            player, opponent = opponent, player
+
+            move = None
+            key = player.position_key(board)
+            if tt is None or len(pv) >= depth or key in seen:
+                break
+            seen.add(key)
+            entry = tt.probe(key)
+            if entry and entry[3]:
+                move = player.get_pseudo_legal_move(board, opponent, entry[3])
+
+        for player, opponent, encoded, undo in reversed(undos):
+            player.undo_move_fast(encoded, board, opponent, undo)
+        return pv
+
+    def get_expected_reply(
+        self,
+        board: Board,
+        other_player,
+        move: Tuple[Index, Index],
+        tt: TranspositionTable,
+    ) -> Optional[Tuple[Index, Index]]:
+        """The opponent's best reply to move in tt, if it is legal"""
+        pv = self.get_pv(board, other_player, move, tt, 2)
+        return pv[1] if len(pv) > 1 else None
 
     def get_and_print_best_move(
-            self, board: Board, other_player, depth=2) -> str:
-        start = time.time()
+        self, board: Board, other_player, search: Search = None
+    ) -> str:
+        if search is None:
+            search = Search(DEFAULT_DEPTH)
 
-        best_move, move_score, node_count, best_moves = self.get_best_move(
-            board, other_player, depth)
-        total_time = time.time() - start
+        best_move, move_score, depth, best_moves = self.get_best_move(
+            board, other_player, search
+        )
+        total_time = search.elapsed()
+        node_count = search.total_nodes()
 
         nps = node_count / total_time
         print(
             f"nps: {nps:.0f} evaluated {node_count} nodes in {total_time:.2f}s"
         )
-        uci.uci(f"info nps {nps:.0f}")
-        uci.uci(f"info depth {depth:.0f}")
-        uci.uci(f"info nodes {node_count}")
-        uci.uci("info score cp {}".format(self.value(board, other_player)))
-        match = best_moves[0][0]
+        uci.uci(
+            "info nodes {} nps {:.0f} time {:.0f}".format(
+                node_count, nps, total_time * 1000
+            )
+        )
 
-        print("selecting between scores of value: {}".format(match))
         for move in best_moves:
             print("best move: {} score: {}".format(
                 indices_to_uci_str(
@@ -1063,105 +1951,627 @@ class Player:
         )
 
     def minimax(
-        self, board: Board, other_player, depth: int, maximizing_player: bool
-    ) -> Tuple[List[Tuple], int, int]:
-
-        nodes = 0
-        best_moves = []
-        if depth == 0:
-            if maximizing_player:
-                return ([()], self.value(board, other_player), 1)
-            else:
-                return ([()], other_player.value(board, self), 1)
-
-        if maximizing_player:
-
-            possible_moves = self.get_possible_moves_index(board, other_player)
-            out_value = -INF
-            for move in possible_moves:
-                src, dst = move
-                undo = self.do_move(
-                    indices_to_cmd(src, dst), board, other_player
-                )
-                _, minimax, count = self.minimax(
-                    board, other_player, depth - 1, False
+        self,
+        board: Board,
+        other_player,
+        depth: int,
+        alpha: int = -INF,
+        beta: int = INF,
+        ply: int = 0,
+        search: Search = None,
+        allow_null: bool = True,
+    ) -> Tuple[List[Tuple], int]:
+        """Fail-soft alpha-beta search in negamax form
+
+        The returned score is relative to self, the side to move, and each
+        recursion swaps the players and negates the window. Children scoring
+        at or below alpha are cut short, so only their bounds are known.
+
+        At the root (ply 0) alpha trails the best score by one, so moves that
+        tie for best are scored exactly and all of them are returned, the
+        same set that a full-width minimax would select between.
+
+        Null move pruning: if passing the turn and searching reduced still
+        beats beta, a real move will too and the node is cut off. This is
+        wrong in zugzwang, so it is not tried in check, with only king and
+        pawns left, directly after another null move or while verifying.
+
+        Frontier pruning, near the leaves and unless in check or in a mating
+        line: reverse futility returns early if the material balance beats
+        beta by a margin, razoring drops into quiescence if it is a margin
+        below alpha, and futility pruning skips quiet moves that don't give
+        check when even a margin would not lift the balance to alpha.
+        Captures losing material by static exchange evaluation are skipped
+        within SEE_PRUNE_DEPTH of the leaves.
+
+        Principal variation search: below the root the first move is
+        searched with the full window, the rest only with a null window to
+        prove they are no better, and again with the full window if that
+        proof fails. The root needs exact scores for ties, which would fail
+        every null window, so it keeps the full window.
+
+        Late move reductions: quiet moves ordered late are searched
+        shallower with the null window, and only searched again at full
+        depth if they beat alpha. Captures, killers, checking moves and
+        moves out of check are never reduced.
+
+        A side in check is searched one ply deeper. Without legal moves the
+        node is mate, scored by distance from the root, or stalemate. Once
+        a shorter mate is known, longer ones are pruned by narrowing the
+        window to what is still achievable at this ply.
+
+        Once search.stopped is set every node returns immediately; the
+        result of an interrupted root is only valid for the moves it lists.
+        """
+        if search is None:
+            search = Search()
+        search.pv_table[ply] = []
+        if ply > search.seldepth:
+            search.seldepth = ply
+        in_check = self.in_check(board, other_player)
+        if in_check:
+            depth += 1
+        if depth == 0 or ply >= MAX_PLY - 1:
+            return (
+                [()],
+                self.quiescence(
+                    board, other_player, alpha, beta, search, ply
+                ),
+            )
+        if search.tick():
+            return ([], 0)
+
+        # Mate distance pruning
+        if ply:
+            alpha = max(alpha, -MATE + ply)
+            beta = min(beta, MATE - ply - 1)
+            if alpha >= beta:
+                return ([], alpha)
+
+        # Transposition table: cut off on a deep enough bound, else try the
+        # stored best move first. The root always searches, every move tying
+        # for best has to be found, and so do other nodes with an open
+        # window, whose principal variation the table doesn't keep.
+        tt = search.tt
+        tt_move = 0
+        if tt is not None:
+            key = self.position_key(board)
+            entry = tt.probe(key)
+            if entry:
+                tt_depth, bound, tt_score, tt_move = entry
+                tt_score = score_from_tt(tt_score, ply)
+                if ply and beta - alpha == 1 and tt_depth >= depth and (
+                    BOUND_EXACT == bound
+                    or (BOUND_LOWER == bound and tt_score >= beta)
+                    or (BOUND_UPPER == bound and tt_score <= alpha)
+                ):
+                    move = [decode_move(tt_move)] if tt_move else []
+                    return (move, tt_score)
+
+        # Frontier pruning, trusting the material balance near the leaves
+        futility_value = None
+        if (
+            ply
+            and depth <= FRONTIER_DEPTH
+            and not in_check
+            and not is_mate_score(alpha)
+            and not is_mate_score(beta)
+        ):
+            static_eval = self.value(board, other_player)
+
+            # Reverse futility: too far above beta to be caught up with
+            margin = search.reverse_futility_margin * depth
+            if static_eval - margin >= beta:
+                return ([], static_eval - margin)
+
+            # Razoring: far below alpha, only captures could help
+            margin = search.razor_margin * depth
+            if depth <= RAZOR_DEPTH and static_eval + margin <= alpha:
+                score = self.quiescence(
+                    board, other_player, alpha, alpha + 1, search, ply
                 )
+                if score <= alpha:
+                    return ([], score)
 
-                self.undo_move(
-                    indices_to_cmd(src, dst), board, other_player, undo
-                )
+            # Futility: quiet moves will not get near alpha, see below
+            margin = search.futility_margin * depth
+            if depth <= FUTILITY_DEPTH and static_eval + margin <= alpha:
+                futility_value = static_eval + margin
 
-                if minimax > out_value:
-                    best_moves = [move]
-                    out_value = minimax
-                elif minimax == out_value:
-                    best_moves.append(move)
+        if (
+            ply
+            and allow_null
+            and depth >= NULL_MOVE_MIN_DEPTH
+            and search.played[ply - 1]
+            and self.value(board, other_player) >= beta
+            and not in_check
+            and not is_mate_score(beta)
+            and self.has_non_pawn_material(board)
+        ):
+            reduction = NULL_MOVE_R + (depth >= NULL_MOVE_DEEP_DEPTH)
+            search.played[ply] = 0
+            _, score = other_player.minimax(
+                board,
+                self,
+                max(depth - 1 - reduction, 0),
+                -beta,
+                -beta + 1,
+                ply + 1,
+                search,
+            )
+            if search.stopped:
+                return ([], 0)
+            score = -score
+            if score >= beta:
+                # A mate found after passing is not to be trusted
+                if is_mate_score(score):
+                    score = beta
+                if not (
+                    search.null_verify and depth >= NULL_MOVE_VERIFY_DEPTH
+                ):
+                    return ([], score)
+                _, verified = self.minimax(
+                    board,
+                    other_player,
+                    depth - reduction,
+                    beta - 1,
+                    beta,
+                    ply,
+                    search,
+                    allow_null=False,
+                )
+                if search.stopped:
+                    return ([], 0)
+                if verified >= beta:
+                    return ([], verified)
+
+        order = search.order
+        previous = search.played[ply - 1] if ply else 0
+        possible_moves = self.get_ordered_moves(
+            board, other_player, order, ply, tt_move, previous
+        )
 
-                nodes = nodes + count
+        legality = self.get_legality(board, in_check)
+        alpha_orig = alpha
+        best_moves = []
+        out_value = -INF
+        quiets_tried = []
+        killers = order.killers[ply]
+        legal_moves = 0
+        restricted = not ply and (
+            search.excluded or search.searchmoves is not None
+        )
+        squares = board.board
+        for encoded in possible_moves:
+            # Legal moves before this one
+            move_number = legal_moves
+            move = src, dst = decode_move(encoded)
+            if restricted and (
+                encoded in search.excluded
+                or search.searchmoves is not None
+                and encoded not in search.searchmoves
+            ):
+                continue
+            victim = squares[dst.x][dst.y]
+            quiet = not victim
+            if (
+                ply
+                and move_number
+                and not quiet
+                and depth <= SEE_PRUNE_DEPTH
+                and not in_check
+                and not is_mate_score(alpha)
+                and victim.value < squares[src.x][src.y].value
+                and see(board, src, dst) < 0
+            ):
+                continue
 
-            return (best_moves, out_value, nodes)
-        else:
-            possible_moves = other_player.get_possible_moves_index(board, self)
-            out_value = INF
-            for move in possible_moves:
-                src, dst = move
-                undo = other_player.do_move(
-                    indices_to_cmd(src, dst), board, self
+            reduction = 0
+            if (
+                ply
+                and move_number
+                and quiet
+                and depth >= LMR_MIN_DEPTH
+                and move_number >= LMR_MIN_MOVES
+                and encoded not in killers
+                and not in_check
+            ):
+                reduction = LMR_TABLE[min(depth, MAX_DEPTH)][
+                    min(move_number, 63)
+                ]
+
+            safe = self.is_safe(encoded, legality)
+            if safe is False:
+                continue
+            undo = self.do_move_fast(encoded, board, other_player)
+            if safe is None and self.in_check(board, other_player):
+                self.undo_move_fast(encoded, board, other_player, undo)
+                continue
+            legal_moves += 1
+            search.played[ply] = encoded
+            if (
+                not ply
+                and not search.worker
+                and search.elapsed() > CURRMOVE_DELAY
+            ):
+                uci.uci(
+                    "info currmove {} currmovenumber {}".format(
+                        move_to_uci_str(encoded), legal_moves
+                    )
                 )
-                _, minimax, count = self.minimax(
-                    board, other_player, depth - 1, True
+            prunable = futility_value is not None and move_number and quiet
+            if (reduction or prunable) and other_player.in_check(board, self):
+                reduction = 0
+            elif prunable:
+                self.undo_move_fast(encoded, board, other_player, undo)
+                out_value = max(out_value, futility_value)
+                continue
+            if not move_number or not ply:
+                _, score = other_player.minimax(
+                    board, self, depth - 1, -beta, -alpha, ply + 1, search
                 )
-
-                other_player.undo_move(
-                    indices_to_cmd(src, dst), board, self, undo
+            else:
+                _, score = other_player.minimax(
+                    board,
+                    self,
+                    max(depth - 1 - reduction, 0),
+                    -alpha - 1,
+                    -alpha,
+                    ply + 1,
+                    search,
                 )
+                if reduction and -score > alpha:
+                    _, score = other_player.minimax(
+                        board,
+                        self,
+                        depth - 1,
+                        -alpha - 1,
+                        -alpha,
+                        ply + 1,
+                        search,
+                    )
+                if alpha < -score < beta:
+                    _, score = other_player.minimax(
+                        board,
+                        self,
+                        depth - 1,
+                        -beta,
+                        -alpha,
+                        ply + 1,
+                        search,
+                    )
+            self.undo_move_fast(encoded, board, other_player, undo)
+            if search.stopped:
+                break
+            score = -score
+
+            if score > out_value:
+                best_moves = [move]
+                out_value = score
+                search.pv_table[ply] = [move] + search.pv_table[ply + 1]
+                if score >= beta:
+                    if quiet:
+                        order.update(
+                            encoded,
+                            quiets_tried,
+                            self.color,
+                            depth,
+                            ply,
+                            previous,
+                        )
+                    break
+                if ply:
+                    alpha = max(alpha, score)
+                else:
+                    alpha = max(alpha, score - 1)
+            elif score == out_value:
+                best_moves.append(move)
+            if quiet:
+                quiets_tried.append(encoded)
+
+        if not legal_moves and not search.stopped:
+            # Nothing left to search at the root doesn't make it mate
+            if restricted:
+                return ([], -INF)
+            return ([], -MATE + ply if in_check else 0)
+
+        # A restricted root only knows about some of the moves
+        if tt is not None and not search.stopped and not restricted:
+            if out_value >= beta:
+                bound = BOUND_LOWER
+            elif out_value <= alpha_orig:
+                bound = BOUND_UPPER
+            else:
+                bound = BOUND_EXACT
+            best = encode_move(*best_moves[0]) if best_moves else 0
+            tt.store(key, depth, bound, score_to_tt(out_value, ply), best)
 
-                if minimax < out_value:
-                    best_moves = [move]
-                    out_value = minimax
-                elif minimax == out_value:
-                    best_moves.append(move)
+        return (best_moves, out_value)
+
+    def quiescence(
+        self,
+        board: Board,
+        other_player,
+        alpha: int,
+        beta: int,
+        search: Search,
+        ply: int = 0,
+    ) -> int:
+        """Resolve captures at the leaves of minimax
+
+        The side to move may stand pat on the material balance or try a
+        capture, so the leaf score no longer depends on which side happened
+        to move last in an exchange. Captures that cannot raise the score to
+        alpha even with DELTA_MARGIN to spare, or that lose material by
+        static exchange evaluation, are not searched.
+        """
+        if search.tick():
+            return 0
+        if ply > search.seldepth:
+            search.seldepth = ply
+
+        stand_pat = self.value(board, other_player)
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+        out_value = stand_pat
+
+        captures = sorted(
+            self.get_pseudo_captures(board, other_player),
+            key=lambda move: mvv_lva(board, *decode_move(move)),
+            reverse=True,
+        )
+        squares = board.board
+        legality = self.get_legality(board) if captures else None
+        for move in captures:
+            src, dst = decode_move(move)
+            victim = squares[dst.x][dst.y].value
+            if stand_pat + victim + DELTA_MARGIN <= alpha:
+                continue
+            if victim < squares[src.x][src.y].value and (
+                see(board, src, dst) < 0
+            ):
+                continue
+
+            safe = self.is_safe(move, legality)
+            if safe is False:
+                continue
+            undo = self.do_move_fast(move, board, other_player)
+            if safe is None and self.in_check(board, other_player):
+                self.undo_move_fast(move, board, other_player, undo)
+                continue
+            score = -other_player.quiescence(
+                board, self, -beta, -alpha, search, ply + 1
+            )
+            self.undo_move_fast(move, board, other_player, undo)
+            if search.stopped:
+                break
 
-                nodes = nodes + count
+            if score > out_value:
+                out_value = score
+                if score >= beta:
+                    break
+                alpha = max(alpha, score)
+        return out_value
 
-            return (best_moves, out_value, nodes)
+    def get_legal_moves(self, moves: List[int], b, other_player) -> List[int]:
+        """Moves that do not leave the king in check"""
+        legality = self.get_legality(b)
+        legal = []
+        for move in moves:
+            safe = self.is_safe(move, legality)
+            if safe is None:
+                undo = self.do_move_fast(move, b, other_player)
+                safe = not self.in_check(b, other_player)
+                self.undo_move_fast(move, b, other_player, undo)
+            if safe:
+                legal.append(move)
+        return legal
 
+    def get_legality(
+        self, b, in_check: Optional[bool] = None
+    ) -> Optional[Tuple[int, int, dict]]:
+        """What is_safe() needs to know about the position, worked out once:
+        the king's square, the squares moves have to go to if in check (see
+        Bitboards.evasions()) and the pinned pieces with their pin rays.
+        None without bitboards.
 
-    def prune_checking_moves(
-        self, moves: List[Tuple[Index, Index]], b, other_player
-    ) -> List[Tuple[Index, Index]]:
-        """Remove moves that could possibly induce check"""
+        param in_check: whether the king is in check, if already known
+        """
+        if b.bitboards is None:
+            return None
+        king = square(self.king_index)
+        color = self.color.value
+        evasions = bitboard.FULL
+        if in_check is not False:
+            evasions = b.bitboards.evasions(king, color)
+        return (king, evasions, b.bitboards.pins(king, color))
+
+    def is_safe(self, move: int, legality) -> Optional[bool]:
+        """Whether pseudo-legal move keeps the king out of check, going by
+        legality from get_legality()
+
+        A piece other than the king has to stay on its pin ray and, in
+        check, capture the checker or block it. None for king moves and
+        without legality: only playing the move tells.
+        """
+        if legality is None:
+            return None
+        king, evasions, pins = legality
+        src = move & 63
+        if src == king:
+            return None
+        dst = 1 << (move >> 6 & 63)
+        return bool(evasions & dst and pins.get(src, bitboard.FULL) & dst)
+
+    def get_occupied(self, b) -> int:
+        """Bitboard of the squares of this player's pieces"""
+        if b.bitboards is not None:
+            return b.bitboards.occupied[self.color.value]
+        occupied = 0
+        for index in self.index_list:
+            occupied |= 1 << index.y * 8 + index.x
+        return occupied
 
-        unpruned = []
-        for src, dst in moves:
-            undo = self.do_move(indices_to_cmd(src, dst), b, other_player)
+    def get_pseudo_moves(
+        self, b, other_player, target: int = bitboard.FULL
+    ) -> List[int]:
+        """Moves to squares in target, which may leave the king in check
 
-            # Remove move from list if it induces check
-            if not self.in_check(b, other_player):
-                unpruned.append((src, dst))
+        Moves are packed by encode_move(), pieces come in the order of
+        index_list. With bitboards on b their targets are looked up, else
+        the piece classes walk the board.
+        """
+        squares = b.board
+        bitboards = b.bitboards
+        color = self.color.value
+        moves = []
+        for src in self.index_list:
+            src_sq = src.y * 8 + src.x
+            piece = squares[src.x][src.y]
+            if bitboards is None:
+                for dst in piece.get_possible_moves_index(
+                    b, player=self, other_player=other_player
+                ):
+                    dst_sq = dst.y * 8 + dst.x
+                    if target >> dst_sq & 1:
+                        moves.append(src_sq | dst_sq << 6)
+                continue
+            castling = b.castle_rights() if bitboard.KING == piece.kind else 0
+            targets = bitboards.targets(color, piece.kind, src_sq, castling)
+            for dst_sq in bitboard.squares(targets & target):
+                moves.append(src_sq | dst_sq << 6)
+        return moves
 
-            self.undo_move(indices_to_cmd(src, dst), b, other_player, undo)
-        return unpruned
+    def get_moves(self, b, other_player) -> List[int]:
+        """Legal moves, packed by encode_move()"""
+        return self.get_legal_moves(
+            self.get_pseudo_moves(b, other_player), b, other_player
+        )
 
     def get_possible_moves_index(
         self, b, other_player=None
     ) -> List[Tuple[Index, Index]]:
         """Iterate over all pieces and get a list of Tuples with (src, dst)"""
-        moves: List[Tuple[Index, Index]] = []
+        return [decode_move(move) for move in self.get_moves(b, other_player)]
 
-        for src in self.index_list:
-            piece = b.board[src.x][src.y]
-            piece_moves = piece.get_possible_moves_index(
-                b, player=self, other_player=other_player
+    def is_pseudo_legal(self, b, other_player, move: int) -> bool:
+        """Whether this player's piece can make move, which may still leave
+        the king in check
+        """
+        src_sq, dst_sq = move & 63, move >> 6 & 63
+        src = SQUARE_INDEX[src_sq]
+        piece = b.board[src.x][src.y]
+        if not piece or piece.color is not self.color:
+            return False
+        if b.bitboards is not None:
+            castling = b.castle_rights() if isinstance(piece, King) else 0
+            targets = b.bitboards.targets(
+                self.color.value, piece.kind, src_sq, castling
             )
-            for piece in piece_moves:
-                moves.append((src, piece))
+            return bool(targets >> dst_sq & 1)
+        return SQUARE_INDEX[dst_sq] in piece.get_possible_moves_index(
+            b, player=self, other_player=other_player
+        )
 
-        pruned = self.prune_checking_moves(moves, b, other_player)
-        return pruned
+    def get_pseudo_legal_move(
+        self, b, other_player, move: int
+    ) -> Optional[Tuple[Index, Index]]:
+        """Decoded move if this player's piece can make it, which may still
+        leave the king in check
+        """
+        if self.is_pseudo_legal(b, other_player, move):
+            return decode_move(move)
+        return None
+
+    def get_ordered_moves(
+        self,
+        b,
+        other_player,
+        order: MoveOrder,
+        ply: int,
+        hash_move: int = 0,
+        previous: int = 0,
+    ):
+        """Yield pseudo-legal moves best first, generating them in stages
+
+        The hash move, captures that do not lose material (by MVV-LVA),
+        killers, quiet moves (see MoveOrder.sort_moves()), then captures
+        that do. A stage is only generated once the previous one is used up,
+        so a cutoff on an early move saves generating the rest. Moves are
+        packed by encode_move() and may leave the king in check, the caller
+        has to test after do_move_fast().
+        """
+        squares = b.board
+        if hash_move and self.is_pseudo_legal(b, other_player, hash_move):
+            yield hash_move
+
+        captures = [
+            move
+            for move in self.get_pseudo_captures(b, other_player)
+            if move != hash_move
+        ]
+        captures.sort(
+            key=lambda move: mvv_lva(b, *decode_move(move)), reverse=True
+        )
+        losing = []
+        for move in captures:
+            src, dst = decode_move(move)
+            if squares[dst.x][dst.y].value < squares[src.x][src.y].value and (
+                see(b, src, dst) < 0
+            ):
+                losing.append(move)
+            else:
+                yield move
+
+        killers = [
+            killer
+            for killer in order.killers[ply]
+            if killer and killer != hash_move
+        ]
+        for killer in killers:
+            dst = SQUARE_INDEX[killer >> 6 & 63]
+            if not squares[dst.x][dst.y] and self.is_pseudo_legal(
+                b, other_player, killer
+            ):
+                yield killer
+
+        empty = ~(self.get_occupied(b) | other_player.get_occupied(b))
+        quiets = [
+            move
+            for move in self.get_pseudo_moves(b, other_player, empty)
+            if move != hash_move and move not in killers
+        ]
+        yield from order.sort_moves(quiets, b, self.color, ply, 0, previous)
+
+        yield from losing
+
+    def has_non_pawn_material(self, board: Board) -> bool:
+        """Whether this player has anything besides king and pawns"""
+        if board.bitboards is not None:
+            pieces = board.bitboards.pieces[self.color.value]
+            return any(pieces[bitboard.KNIGHT : bitboard.KING])
+        for index in self.index_list:
+            if not isinstance(board.board[index.x][index.y], (King, Pawn)):
+                return True
+        return False
+
+    def get_pseudo_captures(self, b, other_player) -> List[int]:
+        """Captures, packed by encode_move(), including those leaving the
+        king in check
+        """
+        return self.get_pseudo_moves(
+            b, other_player, other_player.get_occupied(b)
+        )
 
     @staticmethod
     def get_material(player, board: Board) -> int:
+        if board.bitboards is not None:
+            color = player.color.value
+            return sum(
+                board.bitboards.count(color, kind) * KIND_VALUE[kind]
+                for kind in bitboard.KINDS
+            )
         score = 0
         for index in player.index_list:
             piece = board.board[index.x][index.y]
@@ -1188,9 +2598,29 @@ class Player:
         # Todo: Maybe don't remove dups for detecting double check?
         return list(set(out))
 
+    def get_defended_squares(self, b: Board) -> int:
+        """Bitboard of get_defended_indices(), b needs its bitboards"""
+        occupied = b.bitboards.all()
+        color = self.color.value
+        squares = b.board
+        out = 0
+        for index in self.index_list:
+            out |= bitboard.attacks(
+                squares[index.x][index.y].kind,
+                color,
+                index.y * 8 + index.x,
+                occupied,
+            )
+        return out
+
     def get_defended_indices(self, b: Board, other_player) -> List[Index]:
         if other_player.color == self.color:
             raise ValueError("Need opposite player to verify checkness")
+        if b.bitboards is not None:
+            return [
+                SQUARE_INDEX[sq]
+                for sq in bitboard.squares(self.get_defended_squares(b))
+            ]
         out = []
         for piece_index in self.index_list:
             piece_obj: Piece
@@ -1210,6 +2640,8 @@ class Player:
     def is_defending_index(self, b: Board, index: Index, other_player) -> bool:
         if other_player.color == self.color:
             raise ValueError("Need opposite player to verify checkness")
+        if b.bitboards is not None:
+            return bool(self.get_defended_squares(b) >> square(index) & 1)
         return index in self.get_defended_indices(b, other_player)
 
     def set_piece_index(self, index: Index):
@@ -1524,5 +2956,71 @@ class Player:
         # Delete the old board index
         src_piece.has_moved = undo["src_piece_moved"]
 
+    def do_move_fast(self, move: int, board: Board, other_player) -> Tuple:
+        """do_move() for a move packed by encode_move(), not verified
+
+        Returns what undo_move_fast() needs to take the move back.
+        """
+        src_sq, dst_sq = move & 63, move >> 6 & 63
+        src = SQUARE_INDEX[src_sq]
+        dst = SQUARE_INDEX[dst_sq]
+        squares = board.board
+        piece = squares[src.x][src.y]
+        has_moved = piece.has_moved
+        captured = squares[dst.x][dst.y]
+        if captured is not None:
+            other_player.remove_piece_index(dst)
+
+        promotion = move >> 12 & 7
+        if promotion:
+            piece = KIND_CLASS[promotion](src.x, src.y, piece.color)
+            board.set_index(src, piece)
+
+        self.update_piece_index(piece, dst)
+        piece.move_to_index(dst)
+        board.set_index(dst, piece)
+        board.clear_index(src)
+
+        castle_undo = None
+        if bitboard.KING == piece.kind:
+            self.king_index = dst
+            if abs(dst_sq - src_sq) == 2:
+                castle_undo = self.do_move_fast(
+                    CASTLE_ROOK_MOVES[dst_sq], board, other_player
+                )
+        return (has_moved, captured, castle_undo)
+
+    def undo_move_fast(
+        self, move: int, board: Board, other_player, undo: Tuple
+    ) -> None:
+        """Take back do_move_fast(move), given what it returned"""
+        has_moved, captured, castle_undo = undo
+        src_sq, dst_sq = move & 63, move >> 6 & 63
+        src = SQUARE_INDEX[src_sq]
+        dst = SQUARE_INDEX[dst_sq]
+        piece = board.board[dst.x][dst.y]
+        if captured is not None:
+            other_player.set_piece_index(dst)
+
+        if move >> 12 & 7:
+            piece = Pawn(dst.x, dst.y, piece.color)
+            board.set_index(dst, piece)
+
+        self.update_piece_index(piece, src)
+        piece.move_to_index(src)
+        board.set_index(src, piece)
+        if captured is not None:
+            board.set_index(dst, captured)
+        else:
+            board.clear_index(dst)
+
+        if castle_undo is not None:
+            self.undo_move_fast(
+                CASTLE_ROOK_MOVES[dst_sq], board, other_player, castle_undo
+            )
+        if bitboard.KING == piece.kind:
+            self.king_index = src
+        piece.has_moved = has_moved
+
     def move(self, move: dict, board: Board, other_player):
         self.do_move(move["move"], board, other_player)
@@ -1,8 +1,14 @@
 #!/usr/bin/env python3.10
 
-from typing import List
+from typing import List, Tuple
 from prompt import read_move
+from transposition import TranspositionTable
+from smp import Helpers
+from mate import find_mate
+from mcts import MCTS
 from components import (
+    Search,
+    MoveOrder,
     Color,
     Column,
     Row,
@@ -14,6 +20,8 @@ from components import (
     King,
     Queen,
     Pawn,
+    cmd_to_index,
+    indices_to_uci_str,
 )
 
 DEFAULT_WHITE = [
@@ -62,6 +70,7 @@ class Chess:
         get_black_move=None,
         white_position=DEFAULT_WHITE,
         black_position=DEFAULT_BLACK,
+        bitboards: bool = True,
     ):
         """Chess game. Has a game loop for two players. Alternatively may be
         used as a chess engine to play against
@@ -72,14 +81,17 @@ class Chess:
             move, if None, pychess will return best move it calculates
         param white_position: white player starting position
         param black_position: white player starting position
+        param bitboards: keep bitboards on the board, see Board
         """
         board = black_position + white_position
-        self.board: Board = Board(board)
+        self.board: Board = Board(board, bitboards=bitboards)
         self.white: Player = Player(Color.WHITE, white_position)
         self.black: Player = Player(Color.BLACK, black_position)
         self.black_input = get_black_move
         self.white_input = get_white_move
         self.move_color = Color.WHITE
+        # Moves played through play(), from the start position
+        self.moves: List = []
 
     def loop(self):
         """Game loop"""
@@ -126,20 +138,126 @@ class Chess:
         except KeyboardInterrupt:
             print()
 
-    def get_best_move(self, opponent_moves: List) -> str:
-        # Update state with opponent's move
-        for opponent_move in opponent_moves:
+    def get_best_move(
+        self,
+        opponent_moves: List,
+        go: dict = None,
+        tt: TranspositionTable = None,
+        order: MoveOrder = None,
+        stop_event=None,
+        ponderhit_event=None,
+        tree: MCTS = None,
+    ) -> str:
+        """Play opponent_moves, then search for the side to move
+
+        The game goes on from one call to the next, so a Chess kept for
+        the game only needs the moves since the last call. The move ordering
+        tables in order are aged by that many plies.
+
+        go mate N first looks for a mate in N moves with the solver in
+        mate.py, searching as usual if there is none. With the Threads
+        option above 1 and a shared tt, helper processes search along, see
+        smp.py. With the MCTS option, tree searches instead of minimax, see
+        mcts.py. The move is followed by the reply to ponder on,
+        "e2e4 ponder e7e5", taken from the principal variation or else from
+        tt.
+
+        param go: fields of the UCI go command which limit the search
+        param tt: transposition table to search with
+        param order: move ordering tables to search with
+        param stop_event: Event to stop the search early with
+        param ponderhit_event: Event turning go ponder into a timed search
+        param tree: Monte-Carlo search tree, kept between searches
+        """
+        self.play(opponent_moves)
+        if order is not None:
+            order.new_search(len(opponent_moves))
+
+        go = go or {}
+
+        search = Search.from_go(go, self.move_color, tt, order)
+        search.stop_event = stop_event
+        search.ponderhit_event = ponderhit_event
+        player, other_player = self.players()
+        mate = int(go.get("mate") or 0)
+        line = None
+        if mate:
+            line = find_mate(player, self.board, other_player, mate, search)
+        if line:
+            move = indices_to_uci_str(*line[0])
+            search.pv = line
+        else:
+            # Within what the solver left of the limits
+            move = self.search(go, tt, search, tree)
+
+        if "0000" == move:
+            return move
+        best = (
+            cmd_to_index({"file": move[0], "rank": move[1]}),
+            cmd_to_index({"file": move[2], "rank": move[3]}),
+        )
+        if len(search.pv) > 1 and search.pv[0] == best:
+            reply = search.pv[1]
+        elif tt is not None:
+            reply = player.get_expected_reply(
+                self.board, other_player, best, tt
+            )
+        else:
+            reply = None
+        if reply is None:
+            return move
+        return f"{move} ponder {indices_to_uci_str(*reply)}"
+
+    def search(
+        self,
+        go: dict,
+        tt: TranspositionTable,
+        search: Search,
+        tree: MCTS = None,
+    ) -> str:
+        """Best move found by search, with helpers if go asks for them"""
+        player, other_player = self.players()
+        options = go.get("options") or {}
+        threads = options.get("Threads", 1)
+        if options.get("MCTS"):
+            tree = tree or MCTS()
+            return tree.get_best_move(
+                self.moves,
+                self.board,
+                player,
+                other_player,
+                search,
+                threads,
+            )
+        helpers = None
+        if threads > 1 and tt is not None and tt.name is not None:
+            helpers = Helpers(self.moves, go, tt, threads - 1)
+            helpers.attach(search)
+        try:
+            return player.get_and_print_best_move(
+                self.board, other_player, search
+            )
+        finally:
+            if helpers:
+                helpers.stop()
+
+    def play(self, moves: List) -> None:
+        """Play moves, alternating sides starting with the side to move"""
+        for move in moves:
             if self.move_color == Color.WHITE:
-                self.white.move(opponent_move, self.board, self.black)
+                self.white.move(move, self.board, self.black)
                 self.move_color = Color.BLACK
             elif self.move_color == Color.BLACK:
-                self.black.move(opponent_move, self.board, self.white)
+                self.black.move(move, self.board, self.white)
                 self.move_color = Color.WHITE
+            self.moves.append(move)
 
+    def players(self) -> Tuple[Player, Player]:
+        """Side to move and its opponent"""
         if self.move_color == Color.WHITE:
-            return self.white.get_and_print_best_move(self.board, self.black)
+            return (self.white, self.black)
         elif self.move_color == Color.BLACK:
-            return self.black.get_and_print_best_move(self.board, self.white)
+            return (self.black, self.white)
         raise ValueError("Invalid color")
 
 
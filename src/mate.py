@@ -0,0 +1,194 @@
+"""Proof-number search for go mate
+
+A mate in n is an AND/OR tree: the attacker needs one move that mates, the
+defender has to be mated after every reply. Only checks can mate, so the
+attacker's last move is a check, and checks are tried before quiet moves by
+starting them with the smaller proof number. Proof-number search grows the
+tree where it is closest to deciding the root: each node counts the leaves
+that still have to be proved (proof) or disproved (disproof) to settle it,
+and the leaf expanded next is the one that moves the root's smaller number
+the most.
+
+The tree lives in memory, the board is walked from the root to the leaf and
+back at every expansion. Each expansion is a node for the search limits.
+"""
+
+from typing import List, Optional, Tuple
+
+import uci
+from components import (
+    Board,
+    Index,
+    Search,
+    decode_move,
+    encode_move,
+    indices_to_uci_str,
+)
+
+# Proof or disproof of a settled node, no number of leaves can reach it
+PN_INF = 1 << 30
+
+# Initial proof of a quiet attacker move, which leaves the defender more
+# replies than a check
+QUIET_PROOF = 2
+
+
+class Node:
+    """Node of the proof tree, reached from its parent by move
+
+    children is None until the node is expanded.
+    """
+
+    __slots__ = ["move", "children", "proof", "disproof"]
+
+    def __init__(self, move: Optional[Tuple[Index, Index]] = None):
+        self.move = move
+        self.children: Optional[List["Node"]] = None
+        self.proof = 1
+        self.disproof = 1
+
+    def update(self, attacker: bool) -> None:
+        """Back up proof and disproof from the children"""
+        if attacker:
+            self.proof = min(child.proof for child in self.children)
+            self.disproof = min(
+                sum(child.disproof for child in self.children), PN_INF
+            )
+        else:
+            self.proof = min(
+                sum(child.proof for child in self.children), PN_INF
+            )
+            self.disproof = min(child.disproof for child in self.children)
+
+
+def legal_moves(
+    player, board: Board, other_player
+) -> List[Tuple[Tuple[Index, Index], bool]]:
+    """Legal moves of player, each with whether it gives check"""
+    legal = []
+    for move in player.get_pseudo_moves(board, other_player):
+        undo = player.do_move_fast(move, board, other_player)
+        if not player.in_check(board, other_player):
+            legal.append(
+                (decode_move(move), other_player.in_check(board, player))
+            )
+        player.undo_move_fast(move, board, other_player, undo)
+    return legal
+
+
+def expand(
+    node: Node, player, board: Board, other_player, ply: int, moves: int
+) -> None:
+    """Generate the children of node, or settle it if it has none
+
+    player is to move, the attacker at even ply. The attacker's move at
+    ply, or the one just made at an odd ply, is its move ply // 2 + 1.
+    """
+    attacker = not ply & 1
+    last = ply // 2 + 1 >= moves
+    if not attacker and last:
+        # Out of moves, only mate now counts
+        replies = legal_moves(player, board, other_player)
+        mated = not replies and player.in_check(board, other_player)
+        node.proof, node.disproof = (0, PN_INF) if mated else (PN_INF, 0)
+        return
+
+    node.children = []
+    for move, check in legal_moves(player, board, other_player):
+        if attacker and last and not check:
+            continue
+        child = Node(move)
+        if attacker and not check:
+            child.proof = QUIET_PROOF
+        node.children.append(child)
+    if not node.children:
+        mated = not attacker and player.in_check(board, other_player)
+        node.proof, node.disproof = (0, PN_INF) if mated else (PN_INF, 0)
+        return
+    node.update(attacker)
+
+
+def prove(
+    player, board: Board, other_player, moves: int, search: Search
+) -> Optional[Node]:
+    """Proof tree of mate by player in at most moves, None if there is none
+
+    Also None if search ran out before settling it.
+    """
+    root = Node()
+    while root.proof and root.disproof:
+        if search.tick():
+            return None
+
+        # Descend to the most proving node
+        path = [root]
+        undos = []
+        mover, waiter = player, other_player
+        node = root
+        while node.children is not None:
+            if mover is player:
+                node = min(node.children, key=lambda child: child.proof)
+            else:
+                node = min(node.children, key=lambda child: child.disproof)
+            move = encode_move(*node.move)
+            undo = mover.do_move_fast(move, board, waiter)
+            undos.append((mover, waiter, move, undo))
+            path.append(node)
+            mover, waiter = waiter, mover
+
+        expand(node, mover, board, waiter, len(path) - 1, moves)
+
+        for ply in range(len(path) - 2, -1, -1):
+            mover, waiter, move, undo = undos[ply]
+            mover.undo_move_fast(move, board, waiter, undo)
+            path[ply].update(not ply & 1)
+
+    return root if not root.proof else None
+
+
+def mating_line(
+    node: Node, attacker: bool = True
+) -> List[Tuple[Index, Index]]:
+    """Moves of a proof tree, the attacker mating fastest against the
+    defender holding out longest
+    """
+    if not node.children:
+        return []
+    lines = [
+        [child.move] + mating_line(child, not attacker)
+        for child in node.children
+        if not child.proof
+    ]
+    return (min if attacker else max)(lines, key=len)
+
+
+def find_mate(
+    player, board: Board, other_player, moves: int, search: Search
+) -> Optional[List[Tuple[Index, Index]]]:
+    """Shortest mate by player in at most moves, as the mating line
+
+    Proves mate in 1, 2, ... moves in turn, the smaller trees cost little
+    next to the last. Prints info for a mate found, info string otherwise.
+    """
+    for n in range(1, moves + 1):
+        root = prove(player, board, other_player, n, search)
+        if search.stopped:
+            uci.uci(f"info string mate search stopped at mate in {n}")
+            return None
+        if root is not None:
+            line = mating_line(root)
+            elapsed = search.elapsed()
+            uci.uci(
+                "info depth {} score mate {} nodes {} nps {:.0f} "
+                "time {:.0f} pv {}".format(
+                    len(line),
+                    n,
+                    search.nodes,
+                    search.nodes / max(elapsed, 1e-6),
+                    elapsed * 1000,
+                    " ".join(indices_to_uci_str(*move) for move in line),
+                )
+            )
+            return line
+    uci.uci(f"info string no mate in {moves}")
+    return None
@@ -0,0 +1,362 @@
+"""Monte-Carlo tree search, the MCTS option's alternative to minimax
+
+The tree grows by one leaf per playout. From the root, each step follows the
+child with the highest upper confidence bound (UCB1) on its winning rate
+until it reaches a leaf. The leaf is expanded and evaluated statically: the
+quiescence score of the side to move, turned into a winning rate. The rate
+is then added to every node on the way back up, for the side that moved into
+it. The best move is the most visited one.
+
+The search is anytime, running until the time or node limit of the go
+command, or stop. A depth limit means little to a tree grown a leaf at a
+time, it is taken as PLAYOUTS_PER_PLY playouts per ply.
+
+With the Threads option above 1, a pool of processes holding the root
+position evaluates the leaves, with up to that many playouts in flight. The
+pool starts as smp.py's helpers do, see smp.process_context().
+A playout counts as a lost visit on its path until its result comes back
+(virtual loss), which steers the next selections down other paths.
+
+The tree is kept between searches. If the new root was reached from the old
+one by moves in the tree, the search goes on in its subtree.
+"""
+
+import math
+from typing import List, Optional, Tuple
+
+import uci
+from smp import process_context
+from components import (
+    INF,
+    MAX_DEPTH,
+    Board,
+    Index,
+    Search,
+    cmd_to_index,
+    encode_move,
+    indices_to_uci_str,
+)
+
+# Exploration constant of UCB1
+UCB_C = math.sqrt(2)
+
+# Material, in pawns, that multiplies the odds of winning by ten
+PAWNS_PER_DECADE = 4
+
+# Playouts standing in for a ply of depth limit
+PLAYOUTS_PER_PLY = 200
+
+# Seconds between info reports
+INFO_INTERVAL = 1.0
+
+# Seconds to wait on a playout in flight before checking the limits again
+RESULT_TIMEOUT = 0.05
+
+
+def winning_rate(score: int) -> float:
+    """Winning rate of a material score in pawns"""
+    return 1 / (1 + 10 ** (-score / PAWNS_PER_DECADE))
+
+
+def centipawns(rate: float) -> int:
+    """Score in centipawns of a winning rate, inverse of winning_rate()"""
+    rate = min(max(rate, 1e-6), 1 - 1e-6)
+    return round(100 * PAWNS_PER_DECADE * math.log10(rate / (1 - rate)))
+
+
+class Node:
+    """Position reached by move
+
+    visits and value add up the playouts through the node, value as winning
+    rates of the side that made move. pending counts playouts in flight, as
+    virtual losses. children is None until the node is expanded; terminal is
+    the value of a node without moves.
+    """
+
+    __slots__ = ["move", "children", "visits", "value", "pending", "terminal"]
+
+    def __init__(self, move: Optional[Tuple[Index, Index]] = None):
+        self.move = move
+        self.children: Optional[List["Node"]] = None
+        self.visits = 0
+        self.value = 0.0
+        self.pending = 0
+        self.terminal: Optional[float] = None
+
+    def select(self) -> "Node":
+        """Child with the highest upper confidence bound, unvisited first"""
+        log_visits = math.log(max(self.visits + self.pending, 1))
+
+        def ucb(child):
+            visits = child.visits + child.pending
+            if not visits:
+                return math.inf
+            return child.value / visits + UCB_C * math.sqrt(
+                log_visits / visits
+            )
+
+        return max(self.children, key=ucb)
+
+    def best(self) -> "Node":
+        return max(self.children, key=lambda child: child.visits)
+
+
+class Evaluator:
+    """Evaluates leaves, given as moves from the root position"""
+
+    def __init__(self, board: Board, player, other_player):
+        self.board = board
+        self.player = player
+        self.other_player = other_player
+        self.search = Search()
+
+    def evaluate(
+        self, path: List[Tuple[Index, Index]]
+    ) -> Tuple[float, List[Tuple[Index, Index]]]:
+        """Winning rate of the side to move after path, and its moves"""
+        board = self.board
+        player, other_player = self.player, self.other_player
+        undos = []
+        for move in path:
+            encoded = encode_move(*move)
+            undo = player.do_move_fast(encoded, board, other_player)
+            undos.append((player, other_player, encoded, undo))
+            player, other_player = other_player, player
+
+        moves = player.get_possible_moves_index(board, other_player)
+        if moves:
+            rate = winning_rate(
+                player.quiescence(board, other_player, -INF, INF, self.search)
+            )
+        elif player.in_check(board, other_player):
+            rate = 0.0
+        else:
+            rate = 0.5
+
+        for player, other_player, encoded, undo in reversed(undos):
+            player.undo_move_fast(encoded, board, other_player, undo)
+        return rate, moves
+
+
+# Evaluator of a pool process, see start_worker()
+worker_evaluator = None
+
+
+def start_worker(moves: List[dict]) -> None:
+    """Set up a pool process at the root, moves from the start position"""
+    from game import Chess
+
+    global worker_evaluator
+    chess = Chess()
+    chess.play(moves)
+    worker_evaluator = Evaluator(chess.board, *chess.players())
+
+
+def evaluate(
+    path: List[Tuple[Index, Index]]
+) -> Tuple[float, List[Tuple[Index, Index]]]:
+    return worker_evaluator.evaluate(path)
+
+
+class MCTS:
+    """Search tree, kept from one search to the next"""
+
+    __slots__ = ["moves", "root"]
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        self.moves: List[Tuple[Index, Index]] = []
+        self.root = Node()
+
+    def advance(self, moves: List[Tuple[Index, Index]]) -> None:
+        """Root the tree after moves from the start position, keeping the
+        subtree already searched if there is one
+        """
+        node = None
+        if moves[: len(self.moves)] == self.moves:
+            node = self.root
+            for move in moves[len(self.moves) :]:
+                node = next(
+                    (c for c in node.children or [] if c.move == move), None
+                )
+                if node is None:
+                    break
+        self.moves = list(moves)
+        self.root = node or Node()
+
+    def principal_variation(self) -> List[Tuple[Index, Index]]:
+        pv = []
+        node = self.root
+        while node.children and node.visits:
+            node = node.best()
+            if not node.visits:
+                break
+            pv.append(node.move)
+        return pv
+
+    def get_best_move(
+        self,
+        moves: List[dict],
+        board: Board,
+        player,
+        other_player,
+        search: Search,
+        threads: int = 1,
+    ) -> str:
+        """Search the position after moves, on board with player to move
+
+        Reports info every INFO_INTERVAL seconds and when done. The most
+        visited line is left in search.pv. If the limits leave no playout
+        done, the pool's being slow to start say, playouts are made here
+        until there is a move.
+
+        param moves: moves from the start position to the root
+        param threads: processes evaluating leaves, 1 evaluates them here
+        """
+        self.advance(
+            [
+                (
+                    cmd_to_index(move["move"]["start"]),
+                    cmd_to_index(move["move"]["end"]),
+                )
+                for move in moves
+            ]
+        )
+        pool = None
+        if threads > 1:
+            pool = process_context().Pool(
+                threads, start_worker, (moves,)
+            )
+        budget = search.max_nodes
+        if search.max_depth < MAX_DEPTH:
+            budget = min(budget, search.max_depth * PLAYOUTS_PER_PLY)
+        evaluator = Evaluator(board, player, other_player)
+        in_flight = []
+        reported = 0.0
+        try:
+            while not (
+                search.nodes >= budget
+                or search.poll()
+                or search.used() >= search.soft_limit
+            ):
+                if search.elapsed() - reported >= INFO_INTERVAL:
+                    reported = search.elapsed()
+                    self.report(search)
+                if len(in_flight) >= threads:
+                    self.collect(in_flight, block=True)
+                    continue
+
+                path = self.select()
+                leaf = path[-1]
+                if leaf.terminal is None and leaf.pending > 1:
+                    # Already in flight, wait for it
+                    self.backup(path, None)
+                    self.collect(in_flight, block=True)
+                    continue
+                search.nodes += 1
+                search.seldepth = max(search.seldepth, len(path) - 1)
+                if leaf.terminal is not None:
+                    self.backup(path, leaf.terminal)
+                elif pool is None:
+                    self.playout(path, evaluator)
+                else:
+                    result = pool.apply_async(
+                        evaluate, ([node.move for node in path[1:]],)
+                    )
+                    in_flight.append((path, result))
+                    self.collect(in_flight, block=False)
+            # Playouts in flight are all but done, count them unless stopped
+            while in_flight and not search.poll():
+                self.collect(in_flight, block=True)
+        finally:
+            for path, _ in in_flight:
+                self.backup(path, None)
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+        while not self.principal_variation() and self.root.terminal is None:
+            path = self.select()
+            search.nodes += 1
+            if path[-1].terminal is not None:
+                self.backup(path, path[-1].terminal)
+            else:
+                self.playout(path, evaluator)
+
+        self.report(search)
+        search.pv = self.principal_variation()
+        if not search.pv:
+            return "0000"
+        return indices_to_uci_str(*search.pv[0])
+
+    def select(self) -> List[Node]:
+        """Path from the root to a leaf, marked as in flight"""
+        node = self.root
+        node.pending += 1
+        path = [node]
+        while node.children:
+            node = node.select()
+            node.pending += 1
+            path.append(node)
+        return path
+
+    def playout(self, path: List[Node], evaluator: Evaluator) -> None:
+        """Evaluate the leaf ending path in this process"""
+        rate, children = evaluator.evaluate([node.move for node in path[1:]])
+        self.expand(path, rate, children)
+
+    def expand(
+        self, path: List[Node], rate: float, moves: List[Tuple[Index, Index]]
+    ) -> None:
+        """Add the evaluation of the leaf ending path"""
+        leaf = path[-1]
+        if leaf.children is None:
+            leaf.children = [Node(move) for move in moves]
+            if not moves:
+                leaf.terminal = 1 - rate
+        self.backup(path, 1 - rate)
+
+    def backup(self, path: List[Node], value: Optional[float]) -> None:
+        """Take path out of flight, counting a visit worth value to the
+        side moving into the leaf, if not None
+        """
+        for node in reversed(path):
+            node.pending -= 1
+            if value is not None:
+                node.visits += 1
+                node.value += value
+                value = 1 - value
+
+    def collect(self, in_flight: List, block: bool) -> None:
+        """Expand the leaves of finished playouts, waiting for the first
+        one if block
+        """
+        if block and in_flight:
+            # Not for long, the limits are checked in between
+            in_flight[0][1].wait(RESULT_TIMEOUT)
+        done = [entry for entry in in_flight if entry[1].ready()]
+        for entry in done:
+            in_flight.remove(entry)
+            path, result = entry
+            self.expand(path, *result.get())
+
+    def report(self, search: Search) -> None:
+        pv = self.principal_variation()
+        if not pv:
+            return
+        best = self.root.best()
+        elapsed = search.elapsed()
+        uci.uci(
+            "info depth {} seldepth {} score cp {} nodes {} nps {:.0f} "
+            "time {:.0f} pv {}".format(
+                len(pv),
+                search.seldepth,
+                centipawns(best.value / best.visits),
+                search.nodes,
+                search.nodes / max(elapsed, 1e-6),
+                elapsed * 1000,
+                " ".join(indices_to_uci_str(*move) for move in pv),
+            )
+        )
@@ -0,0 +1,134 @@
+"""Lazy SMP: helper processes searching alongside the main search
+
+Threads are no use to a pure Python search, so helpers are processes. Each
+one replays the game, then runs iterative deepening on the same root as the
+main search, on its own. The only thing they share is the transposition
+table, in shared memory: whatever one process stores, the others probe, so
+helpers pull the main search ahead by filling the table with positions it
+is about to visit. To keep helpers from all searching the same tree in the
+same order, odd ones skip the first iteration and each starts with its own
+random noise in the history table.
+
+Helpers report nothing. Their node counts are published in shared_nodes for
+the main search to add up, and they run until the main search is done.
+
+Helpers are never forked from the engine, see process_context().
+"""
+
+import multiprocessing
+import random
+from typing import List
+
+from components import Search, MoveOrder
+from transposition import TranspositionTable
+
+# History noise, below any depth squared bonus worth mentioning
+HISTORY_NOISE = 16
+
+# Seconds a helper gets to finish its node after being told to stop
+JOIN_TIMEOUT = 1.0
+
+
+def process_context():
+    """Multiprocessing context to start engine processes in
+
+    Forking is out: the UCI loop waits in input() holding the stdin lock
+    when a search starts processes, and a forked child hangs closing stdin.
+    A fork server, where there is one, is started once and has the engine
+    imported, so processes start quickly. Spawn is the fallback.
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__, "game"])
+    return context
+
+
+def perturb(order: MoveOrder, seed: int) -> None:
+    """Add seeded noise to the history table, varying quiet move order"""
+    rng = random.Random(seed)
+    for table in order.history.values():
+        for i in range(len(table)):
+            table[i] += rng.randrange(HISTORY_NOISE)
+
+
+def helper(
+    moves: List[dict],
+    go: dict,
+    tt_name: str,
+    megabytes: int,
+    age: int,
+    worker: int,
+    shared_nodes,
+    stop_event,
+) -> None:
+    """Body of a helper process, searching until stop_event is set"""
+    from game import Chess
+
+    chess = Chess()
+    chess.play(moves)
+    tt = TranspositionTable(megabytes, name=tt_name)
+    try:
+        order = MoveOrder()
+        perturb(order, worker)
+        search = Search.from_go(go, chess.move_color, tt, order)
+        # Entries of this search are the main search's age
+        tt.age = age
+        search.worker = worker
+        search.stop_event = stop_event
+        search.shared_nodes = shared_nodes
+        player, other_player = chess.players()
+        player.get_best_move(chess.board, other_player, search)
+    finally:
+        tt.close()
+
+
+class Helpers:
+    """Helper processes for one search
+
+    param moves: moves from the start position to the root
+    param go: fields of the UCI go command, as for the main search
+    param tt: shared transposition table of the main search
+    param count: number of helpers to start
+    """
+
+    def __init__(
+        self, moves: List[dict], go: dict, tt: TranspositionTable, count: int
+    ):
+        if tt.name is None:
+            raise ValueError("Helpers need a shared transposition table")
+        context = process_context()
+        self.stop_event = context.Event()
+        # Slot 0 is the main search's, which keeps count itself
+        self.shared_nodes = context.Array("Q", count + 1, lock=False)
+        self.processes = [
+            context.Process(
+                target=helper,
+                args=(
+                    moves,
+                    go,
+                    tt.name,
+                    tt.megabytes,
+                    tt.age,
+                    worker,
+                    self.shared_nodes,
+                    self.stop_event,
+                ),
+                daemon=True,
+            )
+            for worker in range(1, count + 1)
+        ]
+        for process in self.processes:
+            process.start()
+
+    def attach(self, search: Search) -> None:
+        """Make search the main search, counting the helpers' nodes"""
+        search.shared_nodes = self.shared_nodes
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        for process in self.processes:
+            process.join(JOIN_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+                process.join()
@@ -0,0 +1,229 @@
+import random
+
+from ..game import Chess
+from ..components import (
+    Color,
+    Row,
+    Column,
+    Board,
+    Player,
+    Rook,
+    King,
+    Pawn,
+    Index,
+    Knight,
+    KNIGHT_INDICES,
+    PAWN_PUSH_INDICES,
+    indices_to_cmd,
+    square,
+)
+from ..bitboard import (
+    BLACK,
+    WHITE,
+    KING,
+    KNIGHT,
+    PAWN,
+    ROOK,
+    KING_ATTACKS,
+    KNIGHT_ATTACKS,
+    PAWN_ATTACKS,
+    DIAGONAL,
+    STRAIGHT,
+    BETWEEN,
+    FULL,
+    Bitboards,
+    bishop_attacks,
+    ray_attacks,
+    rook_attacks,
+    squares,
+)
+
+
+def sides(chess, white: bool):
+    if white:
+        return chess.white, chess.black
+    return chess.black, chess.white
+
+
+def legal_moves(chess, white: bool):
+    player, other_player = sides(chess, white)
+    return sorted(player.get_possible_moves_index(chess.board, other_player))
+
+
+class TestBitboard:
+    def test_tables(self):
+        assert 2 == KNIGHT_ATTACKS[0].bit_count()
+        assert 8 == KNIGHT_ATTACKS[27].bit_count()
+        assert 3 == KING_ATTACKS[63].bit_count()
+        assert [9] == list(squares(PAWN_ATTACKS[WHITE][0]))
+        assert [54] == list(squares(PAWN_ATTACKS[BLACK][63]))
+
+    def test_index_tables(self):
+        e2 = square(Index(Column.E, Row._2))
+        assert (
+            Index(Column.E, Row._3),
+            Index(Column.E, Row._4),
+        ) == PAWN_PUSH_INDICES[Color.WHITE][e2]
+        assert 1 == len(PAWN_PUSH_INDICES[Color.BLACK][e2])
+        assert () == PAWN_PUSH_INDICES[Color.WHITE][63]
+
+        knight = Knight(Column.A, Row._1, Color.WHITE)
+        assert {(1, 2), (2, 1)} == set(knight.get_potentials())
+        knight.move_to_index(Index(Column.E, Row._4))
+        assert KNIGHT_INDICES[28] == knight.get_potentials()
+
+    def test_squares(self):
+        assert [0, 5, 63] == list(squares(1 | 1 << 5 | 1 << 63))
+        assert [] == list(squares(0))
+
+    def test_ray_attacks(self):
+        # Rook on A1, blocked on A3 and D1
+        attacks = ray_attacks(0, 1 << 16 | 1 << 3, STRAIGHT)
+        assert [1, 2, 3, 8, 16] == list(squares(attacks))
+
+    def test_line_tables(self):
+        rand = random.Random(1)
+        for _ in range(1000):
+            sq = rand.randrange(64)
+            occupied = rand.getrandbits(64) & rand.getrandbits(64)
+            assert ray_attacks(sq, occupied, STRAIGHT) == rook_attacks(
+                sq, occupied
+            )
+            assert ray_attacks(sq, occupied, DIAGONAL) == bishop_attacks(
+                sq, occupied
+            )
+
+    def test_is_attacked(self):
+        bitboards = Bitboards()
+        bitboards.add(WHITE, ROOK, 0)
+        bitboards.add(WHITE, PAWN, 12)
+        bitboards.add(BLACK, KNIGHT, 21)
+        assert bitboards.is_attacked(56, WHITE)
+        assert bitboards.is_attacked(19, WHITE)
+        assert not bitboards.is_attacked(20, WHITE)
+        assert bitboards.is_attacked(4, BLACK)
+        bitboards.add(BLACK, KING, 8)
+        assert not bitboards.is_attacked(56, WHITE)
+
+    def test_least_valuable_attacker(self):
+        bitboards = Bitboards()
+        bitboards.add(WHITE, ROOK, 3)
+        bitboards.add(WHITE, ROOK, 11)
+        bitboards.add(WHITE, KNIGHT, 41)
+        bitboards.add(WHITE, PAWN, 26)
+        # On D5, the pawn on C4 first, then the knight on B6
+        occupied = bitboards.all()
+        assert 26 == bitboards.least_valuable_attacker(35, WHITE, occupied)
+        occupied &= ~(1 << 26)
+        assert 41 == bitboards.least_valuable_attacker(35, WHITE, occupied)
+        # The rook behind joins in once the first one is gone
+        occupied &= ~(1 << 41)
+        assert 11 == bitboards.least_valuable_attacker(35, WHITE, occupied)
+        occupied &= ~(1 << 11)
+        assert 3 == bitboards.least_valuable_attacker(35, WHITE, occupied)
+        assert bitboards.least_valuable_attacker(35, BLACK, occupied) is None
+
+    def test_pins_and_evasions(self):
+        bitboards = Bitboards()
+        bitboards.add(WHITE, KING, 4)
+        bitboards.add(WHITE, KNIGHT, 12)
+        bitboards.add(BLACK, ROOK, 60)
+        assert {12: BETWEEN[4][60] | 1 << 60} == bitboards.pins(4, WHITE)
+        assert FULL == bitboards.evasions(4, WHITE)
+
+        bitboards.remove(WHITE, KNIGHT, 12)
+        assert {} == bitboards.pins(4, WHITE)
+        assert BETWEEN[4][60] | 1 << 60 == bitboards.evasions(4, WHITE)
+
+        # Double check, only the king can move
+        bitboards.add(BLACK, KNIGHT, 19)
+        assert 0 == bitboards.evasions(4, WHITE)
+
+    def test_pinned_piece_moves(self):
+        white_pieces = [
+            King(Column.E, Row._1, Color.WHITE),
+            Rook(Column.E, Row._4, Color.WHITE),
+        ]
+        black_pieces = [
+            King(Column.A, Row._8, Color.BLACK),
+            Rook(Column.E, Row._8, Color.BLACK),
+        ]
+        for pieces in (white_pieces, black_pieces):
+            for piece in pieces:
+                piece.has_moved = True
+        moves = []
+        for bitboards in (True, False):
+            board = Board(white_pieces + black_pieces, bitboards=bitboards)
+            white = Player(Color.WHITE, white_pieces)
+            black = Player(Color.BLACK, black_pieces)
+            moves.append(sorted(white.get_possible_moves_index(board, black)))
+        assert moves[0] == moves[1]
+        rook_moves = [dst for src, dst in moves[0] if src.y == Row._4]
+        assert all(Column.E == dst.x for dst in rook_moves)
+        assert 6 == len(rook_moves)
+
+    def test_board_keeps_bitboards(self):
+        chess = Chess()
+        bitboards = chess.board.bitboards
+        assert 8 == bitboards.count(WHITE, PAWN)
+        assert 0xFFFF == bitboards.occupied[WHITE]
+        assert 0xFFFF << 48 == bitboards.occupied[BLACK]
+
+        cmd = indices_to_cmd(
+            Index(Column.E, Row._2), Index(Column.E, Row._4)
+        )
+        undo = chess.white.do_move(cmd, chess.board, chess.black)
+        assert 1 << 28 & bitboards.pieces[WHITE][PAWN]
+        assert not 1 << 12 & bitboards.occupied[WHITE]
+        chess.white.undo_move(cmd, chess.board, chess.black, undo)
+        assert Chess().board.bitboards == bitboards
+
+    def test_castling(self):
+        white_pieces = [
+            King(Column.E, Row._1, Color.WHITE),
+            Rook(Column.H, Row._1, Color.WHITE),
+            Rook(Column.A, Row._1, Color.WHITE),
+        ]
+        black_pieces = [
+            King(Column.E, Row._8, Color.BLACK),
+            Rook(Column.D, Row._8, Color.BLACK),
+        ]
+        for bitboards in (True, False):
+            board = Board(white_pieces + black_pieces, bitboards=bitboards)
+            white = Player(Color.WHITE, white_pieces)
+            black = Player(Color.BLACK, black_pieces)
+            moves = white.get_possible_moves_index(board, black)
+            king_moves = {dst for src, dst in moves if src.x == Column.E}
+            # Queenside passes through D1, which the rook on D8 attacks
+            assert Index(Column.G, Row._1) in king_moves
+            assert Index(Column.C, Row._1) not in king_moves
+
+    def test_material(self):
+        pieces = [
+            King(Column.E, Row._1, Color.WHITE),
+            Pawn(Column.E, Row._2, Color.WHITE),
+            Rook(Column.A, Row._1, Color.WHITE),
+        ]
+        for bitboards in (True, False):
+            board = Board(pieces, bitboards=bitboards)
+            player = Player(Color.WHITE, pieces)
+            assert 106 == Player.get_material(player, board)
+            assert player.has_non_pawn_material(board)
+
+    def test_same_moves_as_list(self):
+        """Random games, both backends agree on every legal move"""
+        rand = random.Random(1)
+        for _ in range(4):
+            chess = Chess()
+            legacy = Chess(bitboards=False)
+            for ply in range(40):
+                moves = legal_moves(chess, not ply & 1)
+                assert legal_moves(legacy, not ply & 1) == moves
+                if not moves:
+                    break
+                move = rand.choice(moves)
+                for game in (chess, legacy):
+                    player, other_player = sides(game, not ply & 1)
+                    player.do_move(
+                        indices_to_cmd(*move), game.board, other_player
+                    )
@@ -1,3 +1,7 @@
+import copy
+import math
+import sys
+import threading
 from typing import List
 
 import pytest
@@ -17,9 +21,19 @@ from ..components import (
     Queen,
     King,
     Player,
+    Search,
+    MoveOrder,
     Index,
+    INF,
     index_valid_or_raise,
+    indices_to_cmd,
+    indices_to_uci_str,
+    encode_move,
+    decode_move,
+    move_to_uci_str,
 )
+from .. import components
+from ..transposition import TranspositionTable
 
 
 class TestHelpers:
@@ -701,6 +715,103 @@ class TestKing:
         assert 8 == len(indices)
 
 
+class TestZobrist:
+    def test_move_encoding(self):
+        move = (Index(Column.E, Row._2), Index(Column.E, Row._4))
+        assert move == decode_move(encode_move(*move))
+        assert encode_move(*move)
+
+    def test_board_key_incremental(self):
+        chess = Chess()
+        start_key = chess.white.position_key(chess.board)
+        moves = [
+            (chess.white, chess.black, "e", "2", "e", "4"),
+            (chess.black, chess.white, "d", "7", "d", "5"),
+            (chess.white, chess.black, "e", "4", "d", "5"),
+            (chess.black, chess.white, "d", "8", "d", "5"),
+        ]
+        undos = []
+        for player, other, f1, r1, f2, r2 in moves:
+            cmd = {
+                "start": {"file": f1, "rank": r1},
+                "end": {"file": f2, "rank": r2},
+                "promote": None,
+            }
+            undos.append((player, other, cmd, player.do_move(
+                cmd, chess.board, other
+            )))
+
+        pieces = [p for column in chess.board.board for p in column if p]
+        assert Board(pieces).key == chess.board.key
+        assert start_key != chess.white.position_key(chess.board)
+
+        for player, other, cmd, undo in reversed(undos):
+            player.undo_move(cmd, chess.board, other, undo)
+        assert start_key == chess.white.position_key(chess.board)
+
+    def test_position_key_side_and_castling(self):
+        chess = Chess()
+        white_key = chess.white.position_key(chess.board)
+        assert white_key != chess.black.position_key(chess.board)
+
+        chess.board.get_index(Index(Column.H, Row._1)).has_moved = True
+        assert white_key != chess.white.position_key(chess.board)
+
+
+class TestFastMove:
+    def _round_trip(self, pieces, move):
+        white_pieces = [p for p in pieces if p.color == Color.WHITE]
+        black_pieces = [p for p in pieces if p.color == Color.BLACK]
+        board = Board(pieces)
+        white = Player(Color.WHITE, white_pieces)
+        black = Player(Color.BLACK, black_pieces)
+        before = (copy.deepcopy(board), copy.deepcopy(white), board.key)
+        undo = white.do_move_fast(move, board, black)
+        after = copy.deepcopy(board)
+        white.undo_move_fast(move, board, black, undo)
+        assert before == (board, white, board.key)
+        assert before[0].bitboards == board.bitboards
+        return after
+
+    def test_castle(self):
+        board = self._round_trip(
+            [
+                King(Column.E, Row._1, Color.WHITE),
+                Rook(Column.H, Row._1, Color.WHITE),
+                King(Column.E, Row._8, Color.BLACK),
+            ],
+            encode_move(Index(Column.E, Row._1), Index(Column.G, Row._1)),
+        )
+        assert isinstance(board.get_index(Index(Column.F, Row._1)), Rook)
+        assert not board.get_index(Index(Column.H, Row._1))
+
+    def test_capture_and_promotion(self):
+        move = encode_move(
+            Index(Column.E, Row._7), Index(Column.D, Row._8), 4
+        )
+        assert "e7d8q" == move_to_uci_str(move)
+        board = self._round_trip(
+            [
+                King(Column.A, Row._1, Color.WHITE),
+                Pawn(Column.E, Row._7, Color.WHITE),
+                Rook(Column.D, Row._8, Color.BLACK),
+                King(Column.H, Row._8, Color.BLACK),
+            ],
+            move,
+        )
+        queen = board.get_index(Index(Column.D, Row._8))
+        assert isinstance(queen, Queen) and Color.WHITE == queen.color
+        assert not board.get_index(Index(Column.E, Row._7))
+
+    def test_moves_match_index_moves(self):
+        chess = Chess()
+        moves = chess.white.get_moves(chess.board, chess.black)
+        assert 20 == len(moves)
+        assert [decode_move(move) for move in moves] == (
+            chess.white.get_possible_moves_index(chess.board, chess.black)
+        )
+
+
 class TestPlayer:
     def test_player_get_material(self):
         board = [
@@ -851,3 +962,779 @@ class TestPlayer:
         for position in legal_positions:
             assert position in defended_positions
         assert len(legal_positions) == len(defended_positions)
+
+
+def full_width_minimax(player, board, other_player, depth, ply=0):
+    """Reference negamax without pruning, returns (best moves, score)
+
+    Like minimax it extends checks and scores mates by distance from the
+    root. Leaves are resolved by a full window quiescence search
+    """
+    in_check = player.in_check(board, other_player)
+    if in_check:
+        depth += 1
+    if depth == 0:
+        return (
+            [()],
+            player.quiescence(board, other_player, -INF, INF, Search()),
+        )
+    possible_moves = player.get_possible_moves_index(board, other_player)
+    if not possible_moves:
+        return ([], -components.MATE + ply if in_check else 0)
+    best_moves = []
+    out_value = -INF
+    for src, dst in possible_moves:
+        cmd = indices_to_cmd(src, dst)
+        undo = player.do_move(cmd, board, other_player)
+        _, score = full_width_minimax(
+            other_player, board, player, depth - 1, ply + 1
+        )
+        player.undo_move(cmd, board, other_player, undo)
+        if -score > out_value:
+            best_moves = [(src, dst)]
+            out_value = -score
+        elif -score == out_value:
+            best_moves.append((src, dst))
+    return (best_moves, out_value)
+
+
+class TestMinimax:
+    def test_minimax_matches_full_width_beginning(self):
+        chess = Chess()
+        expected_moves, expected_score = full_width_minimax(
+            chess.white, chess.board, chess.black, 2
+        )
+        moves, score = chess.white.minimax(chess.board, chess.black, 2)
+        assert expected_score == score
+        assert set(expected_moves) == set(moves)
+
+    @pytest.mark.parametrize("depth", [1, 2, 3])
+    def test_minimax_matches_full_width_tactics(self, depth):
+        white_pieces = [
+            King(Column.G, Row._1, Color.WHITE),
+            Rook(Column.D, Row._1, Color.WHITE),
+            Knight(Column.C, Row._3, Color.WHITE),
+            Pawn(Column.F, Row._2, Color.WHITE),
+        ]
+        black_pieces = [
+            King(Column.G, Row._8, Color.BLACK),
+            Queen(Column.D, Row._5, Color.BLACK),
+            Bishop(Column.B, Row._4, Color.BLACK),
+            Pawn(Column.H, Row._7, Color.BLACK),
+        ]
+        b = Board(white_pieces + black_pieces)
+        white = Player(Color.WHITE, white_pieces)
+        black = Player(Color.BLACK, black_pieces)
+        before = copy.deepcopy(b)
+
+        expected_moves, expected_score = full_width_minimax(
+            white, b, black, depth
+        )
+        moves, score = white.minimax(b, black, depth)
+        assert expected_score == score
+        assert set(expected_moves) == set(moves)
+        assert before == b
+
+
+class TestMoveOrder:
+    def _position(self):
+        white_pieces = [
+            King(Column.G, Row._1, Color.WHITE),
+            Rook(Column.D, Row._1, Color.WHITE),
+            Knight(Column.C, Row._3, Color.WHITE),
+            Pawn(Column.A, Row._2, Color.WHITE),
+        ]
+        black_pieces = [
+            King(Column.G, Row._8, Color.BLACK),
+            Queen(Column.D, Row._5, Color.BLACK),
+            Pawn(Column.B, Row._5, Color.BLACK),
+        ]
+        b = Board(white_pieces + black_pieces)
+        white = Player(Color.WHITE, white_pieces)
+        black = Player(Color.BLACK, black_pieces)
+        return b, white, black
+
+    def test_new_search(self):
+        order = MoveOrder()
+        order.killers[2] = [5, 6]
+        order.killers[3] = [7, 0]
+        order.history[Color.WHITE.value][5] = 101
+        order.history[Color.BLACK.value][6] = -7
+        order.counter[Color.WHITE.value][1] = 5
+        order.new_search(2)
+        assert [5, 6] == order.killers[0]
+        assert [7, 0] == order.killers[1]
+        assert [0, 0] == order.killers[2]
+        assert components.MAX_PLY == len(order.killers)
+        assert 50 == order.history[Color.WHITE.value][5]
+        assert -4 == order.history[Color.BLACK.value][6]
+        assert 5 == order.counter[Color.WHITE.value][1]
+
+    def test_sort_mvv_lva(self):
+        b, white, black = self._position()
+        moves = MoveOrder().sort_moves(
+            white.get_moves(b, black), b, Color.WHITE, 0
+        )
+        moves = [decode_move(move) for move in moves]
+        # Queen by knight, queen by rook, and last the pawn by knight, which
+        # the queen takes back
+        assert (Index(Column.C, Row._3), Index(Column.D, Row._5)) == moves[0]
+        assert (Index(Column.D, Row._1), Index(Column.D, Row._5)) == moves[1]
+        assert (Index(Column.C, Row._3), Index(Column.B, Row._5)) == moves[-1]
+
+    def test_sort_hash_killer_counter_history(self):
+        b, white, black = self._position()
+        order = MoveOrder()
+        hash_move = (Index(Column.A, Row._2), Index(Column.A, Row._3))
+        killer = (Index(Column.G, Row._1), Index(Column.H, Row._2))
+        counter = (Index(Column.G, Row._1), Index(Column.F, Row._1))
+        history = (Index(Column.D, Row._1), Index(Column.E, Row._1))
+        previous = encode_move(
+            Index(Column.B, Row._7), Index(Column.B, Row._5)
+        )
+
+        order.update(encode_move(*history), [], Color.WHITE, 3, 5)
+        order.update(encode_move(*counter), [], Color.WHITE, 1, 4, previous)
+        order.update(encode_move(*killer), [], Color.WHITE, 1, 2)
+        moves = order.sort_moves(
+            white.get_moves(b, black),
+            b,
+            Color.WHITE,
+            2,
+            encode_move(*hash_move),
+            previous,
+        )
+        moves = [decode_move(move) for move in moves]
+        assert hash_move == moves[0]
+        assert killer == moves[3]
+        assert counter == moves[4]
+        assert history == moves[5]
+
+    def test_ordered_moves_stages(self):
+        b, white, black = self._position()
+        order = MoveOrder()
+        hash_move = (Index(Column.A, Row._2), Index(Column.A, Row._3))
+        killer = (Index(Column.G, Row._1), Index(Column.H, Row._2))
+        order.update(encode_move(*killer), [], Color.WHITE, 1, 2)
+        moves = [
+            decode_move(move)
+            for move in white.get_ordered_moves(
+                b, black, order, 2, encode_move(*hash_move)
+            )
+        ]
+        assert hash_move == moves[0]
+        assert (Index(Column.C, Row._3), Index(Column.D, Row._5)) == moves[1]
+        assert (Index(Column.D, Row._1), Index(Column.D, Row._5)) == moves[2]
+        assert killer == moves[3]
+        assert (Index(Column.C, Row._3), Index(Column.B, Row._5)) == moves[-1]
+        assert len(moves) == len(set(moves))
+
+    def test_ordered_moves_pseudo_legal(self):
+        # The rook is pinned against the king
+        white_pieces = [
+            King(Column.G, Row._1, Color.WHITE),
+            Rook(Column.F, Row._2, Color.WHITE),
+            Pawn(Column.B, Row._2, Color.WHITE),
+        ]
+        black_pieces = [
+            King(Column.G, Row._8, Color.BLACK),
+            Bishop(Column.D, Row._4, Color.BLACK),
+        ]
+        b = Board(white_pieces + black_pieces)
+        white = Player(Color.WHITE, white_pieces)
+        black = Player(Color.BLACK, black_pieces)
+        legal = white.get_moves(b, black)
+        moves = list(white.get_ordered_moves(b, black, MoveOrder(), 0))
+        assert set(legal) < set(moves)
+        assert set(legal) == set(white.get_legal_moves(moves, b, black))
+
+    def test_ordered_moves_lazy(self, monkeypatch):
+        b, white, black = self._position()
+        hash_move = encode_move(
+            Index(Column.A, Row._2), Index(Column.A, Row._3)
+        )
+        generated = []
+        monkeypatch.setattr(
+            Player,
+            "get_pseudo_captures",
+            lambda *args: generated.append(args) or [],
+        )
+        moves = white.get_ordered_moves(b, black, MoveOrder(), 0, hash_move)
+        assert hash_move == next(moves)
+        assert not generated
+        next(moves)
+        assert generated
+
+    def test_ordered_moves_invalid_hash_move(self):
+        b, white, black = self._position()
+        # Black's pawn, and not a rook move
+        for hash_move in [
+            (Index(Column.B, Row._5), Index(Column.B, Row._4)),
+            (Index(Column.D, Row._1), Index(Column.A, Row._4)),
+        ]:
+            moves = list(
+                white.get_ordered_moves(
+                    b, black, MoveOrder(), 0, encode_move(*hash_move)
+                )
+            )
+            assert encode_move(*hash_move) not in moves
+            assert set(moves) == set(white.get_moves(b, black))
+
+    def test_update_penalises_tried_moves(self):
+        order = MoveOrder()
+        order.update(1, [2, 3], Color.BLACK, 2, 0)
+        assert 4 == order.history[Color.BLACK.value][1]
+        assert -4 == order.history[Color.BLACK.value][2]
+        assert 0 == order.history[Color.WHITE.value][1]
+        assert [1, 0] == order.killers[0]
+        order.update(5, [], Color.BLACK, 2, 0)
+        assert [5, 1] == order.killers[0]
+
+        order.clear()
+        assert [0, 0] == order.killers[0]
+        assert 0 == order.history[Color.BLACK.value][1]
+
+    def test_search_updates_tables(self):
+        chess = Chess()
+        search = Search(depth=3)
+        chess.white.get_best_move(chess.board, chess.black, search)
+        assert any(any(killers) for killers in search.order.killers)
+        assert any(search.order.history[chess.white.color.value])
+
+
+class TestSearch:
+    def test_search_from_go_movetime(self):
+        search = Search.from_go({"movetime": 1000}, Color.WHITE)
+        assert search.soft_limit == pytest.approx(0.95)
+        assert search.deadline - search.start == pytest.approx(0.95)
+
+    def test_search_from_go_uses_own_clock(self):
+        go = {"wtime": "60000", "btime": "6000", "movestogo": "10"}
+        white = Search.from_go(go, Color.WHITE)
+        black = Search.from_go(go, Color.BLACK)
+        assert white.soft_limit > black.soft_limit
+        assert white.deadline - white.start < 60
+        assert black.deadline - black.start < 6
+
+    def test_search_from_go_ponder(self):
+        go = {"ponder": True, "movetime": 1000}
+        search = Search.from_go(go, Color.WHITE)
+        search.ponderhit_event = threading.Event()
+        start = search.start
+        assert math.inf == search.soft_limit == search.deadline
+        for _ in range(64):
+            search.tick()
+        assert math.inf == search.deadline
+        search.ponderhit_event.set()
+        for _ in range(64):
+            search.tick()
+        assert search.soft_limit == pytest.approx(0.95)
+        assert search.deadline - search.clock == pytest.approx(0.95)
+        # Reported times still count the pondering, as the nodes do
+        assert start == search.start
+        assert search.used() <= search.elapsed()
+
+    def test_get_expected_reply(self):
+        chess = Chess()
+        tt = TranspositionTable(1)
+        search = Search(depth=3, tt=tt)
+        _, _, _, best_moves = chess.white.get_best_move(
+            chess.board, chess.black, search
+        )
+        before = copy.deepcopy(chess.board)
+        reply = chess.white.get_expected_reply(
+            chess.board, chess.black, best_moves[0], tt
+        )
+        assert before == chess.board
+        cmd = indices_to_cmd(*best_moves[0])
+        undo = chess.white.do_move(cmd, chess.board, chess.black)
+        assert reply in chess.black.get_possible_moves_index(
+            chess.board, chess.white
+        )
+        chess.white.undo_move(cmd, chess.board, chess.black, undo)
+        assert chess.white.get_expected_reply(
+            chess.board, chess.black, best_moves[0], TranspositionTable(1)
+        ) is None
+
+    def test_search_from_go_multipv_searchmoves(self):
+        go = {
+            "searchmoves": ["e2e4", "g1f3"],
+            "options": {"MultiPV": 3},
+        }
+        search = Search.from_go(go, Color.WHITE)
+        assert 3 == search.multipv
+        assert {
+            encode_move(Index(Column.E, Row._2), Index(Column.E, Row._4)),
+            encode_move(Index(Column.G, Row._1), Index(Column.F, Row._3)),
+        } == search.searchmoves
+
+    def test_get_best_move_searchmoves(self):
+        chess = Chess()
+        search = Search(depth=2)
+        search.searchmoves = {components.uci_str_to_move("a2a3")}
+        move, _, _, _ = chess.white.get_best_move(
+            chess.board, chess.black, search
+        )
+        assert "a2a3" == move
+
+    def test_get_best_move_out_of_nodes(self):
+        chess = Chess()
+        move, _, _, best_moves = chess.white.get_best_move(
+            chess.board, chess.black, Search(nodes=1)
+        )
+        assert "0000" != move
+        assert best_moves[0] in chess.white.get_possible_moves_index(
+            chess.board, chess.black
+        )
+
+        # The table's move, when there is one
+        tt = TranspositionTable(1)
+        chess.white.get_best_move(chess.board, chess.black, Search(2, tt=tt))
+        _, _, _, tt_move = tt.probe(chess.white.position_key(chess.board))
+        move, _, _, _ = chess.white.get_best_move(
+            chess.board, chess.black, Search(nodes=1, tt=tt)
+        )
+        assert move_to_uci_str(tt_move) == move
+
+    def test_get_best_move_multipv(self, capsys):
+        chess = Chess()
+        search = Search(depth=2, tt=TranspositionTable(1))
+        search.multipv = 3
+        chess.white.get_best_move(chess.board, chess.black, search)
+        lines = [
+            line.split()
+            for line in capsys.readouterr().out.splitlines()
+            if line.startswith("info depth 2 ") and "multipv" in line
+        ]
+        assert ["1", "2", "3"] == [
+            line[line.index("multipv") + 1] for line in lines
+        ]
+        first_moves = [line[line.index("pv") + 1] for line in lines]
+        assert 3 == len(set(first_moves))
+        scores = [int(line[line.index("cp") + 1]) for line in lines]
+        assert scores == sorted(scores, reverse=True)
+        assert not search.excluded
+
+    def test_get_pv(self):
+        chess = Chess()
+        tt = TranspositionTable(1)
+        search = Search(depth=3, tt=tt)
+        _, _, _, best_moves = chess.white.get_best_move(
+            chess.board, chess.black, search
+        )
+        before = copy.deepcopy(chess.board)
+        pv = chess.white.get_pv(chess.board, chess.black, best_moves[0], tt, 3)
+        assert before == chess.board
+        assert best_moves[0] == pv[0]
+        assert 1 < len(pv) <= 3
+        players = [chess.white, chess.black]
+        undos = []
+        for ply, move in enumerate(pv):
+            player, opponent = players[ply % 2], players[1 - ply % 2]
+            assert move in player.get_possible_moves_index(
+                chess.board, opponent
+            )
+            cmd = indices_to_cmd(*move)
+            undo = player.do_move(cmd, chess.board, opponent)
+            undos.append((player, opponent, cmd, undo))
+        for player, opponent, cmd, undo in reversed(undos):
+            player.undo_move(cmd, chess.board, opponent, undo)
+        assert [best_moves[0]] == chess.white.get_pv(
+            chess.board, chess.black, best_moves[0], None, 3
+        )
+
+    def test_pv_table(self):
+        chess = Chess()
+        search = Search(depth=3)
+        _, _, _, best_moves = chess.white.get_best_move(
+            chess.board, chess.black, search
+        )
+        assert best_moves[0] == search.pv[0]
+        assert 1 < len(search.pv) <= 3 + 1
+        players = [chess.white, chess.black]
+        undos = []
+        for ply, move in enumerate(search.pv):
+            player, opponent = players[ply % 2], players[1 - ply % 2]
+            assert move in player.get_possible_moves_index(
+                chess.board, opponent
+            )
+            cmd = indices_to_cmd(*move)
+            undo = player.do_move(cmd, chess.board, opponent)
+            undos.append((player, opponent, cmd, undo))
+        for player, opponent, cmd, undo in reversed(undos):
+            player.undo_move(cmd, chess.board, opponent, undo)
+
+    def test_pv_after_tt_warm_re_search(self, capsys):
+        chess = Chess()
+        tt = TranspositionTable(1)
+        for multipv in (1, 1, 3):
+            tt.new_search()
+            search = Search(depth=3, tt=tt)
+            search.multipv = multipv
+            chess.white.get_best_move(chess.board, chess.black, search)
+        lines = [
+            line.split()
+            for line in capsys.readouterr().out.splitlines()
+            if line.startswith("info depth 3 ")
+        ]
+        assert 5 == len(lines)
+        for line in lines:
+            assert 3 == len(line[line.index("pv") + 1 :])
+
+    def test_get_best_move_info(self, capsys):
+        chess = Chess()
+        search = Search(depth=2, tt=TranspositionTable(1))
+        chess.white.get_best_move(chess.board, chess.black, search)
+        line = [
+            line.split()
+            for line in capsys.readouterr().out.splitlines()
+            if line.startswith("info depth 2 ")
+        ][-1]
+        for field in ["seldepth", "nodes", "nps", "hashfull", "time"]:
+            assert int(line[line.index(field) + 1]) >= 0
+        assert int(line[line.index("seldepth") + 1]) >= 2
+        pv = line[line.index("pv") + 1 :]
+        assert [indices_to_uci_str(*move) for move in search.pv] == pv
+
+    def test_currmove_delay(self, capsys, monkeypatch):
+        chess = Chess()
+        chess.white.get_best_move(chess.board, chess.black, Search(depth=1))
+        assert "currmove" not in capsys.readouterr().out
+        # Chess plays with the top level components module
+        module = sys.modules[type(chess.white).__module__]
+        monkeypatch.setattr(module, "CURRMOVE_DELAY", -1)
+        chess.white.get_best_move(chess.board, chess.black, Search(depth=1))
+        numbers = [
+            int(line.split()[-1])
+            for line in capsys.readouterr().out.splitlines()
+            if line.startswith("info currmove")
+        ]
+        assert list(range(1, 21)) == numbers
+
+    def test_search_from_go_no_limits(self):
+        search = Search.from_go({}, Color.WHITE)
+        assert 0 < search.max_depth < 64
+
+    def test_get_best_move_depth_limit(self):
+        chess = Chess()
+        search = Search(depth=2)
+        _, _, depth, _ = chess.white.get_best_move(
+            chess.board, chess.black, search
+        )
+        assert 2 == depth
+
+    def test_get_best_move_node_limit(self):
+        chess = Chess()
+        before = copy.deepcopy(chess.board)
+        search = Search(nodes=100)
+        move, _, _, _ = chess.white.get_best_move(
+            chess.board, chess.black, search
+        )
+        assert 100 == search.nodes
+        assert move
+        assert before == chess.board
+
+    def test_minimax_transposition_table(self):
+        chess = Chess()
+        tt = TranspositionTable(1)
+        _, expected = chess.white.minimax(chess.board, chess.black, 3)
+
+        search = Search(tt=tt)
+        _, score = chess.white.minimax(
+            chess.board, chess.black, 3, search=search
+        )
+        assert expected == score
+        assert tt.probe(chess.white.position_key(chess.board))
+
+        again = Search(tt=tt)
+        _, score = chess.white.minimax(
+            chess.board, chess.black, 3, search=again
+        )
+        assert expected == score
+        assert again.nodes < search.nodes
+
+    def test_quiescence_resolves_exchange(self):
+        """A pawn guarded by a pawn is not worth a queen"""
+        white_pieces = [
+            King(Column.G, Row._2, Color.WHITE),
+            Queen(Column.D, Row._1, Color.WHITE),
+        ]
+        black_pieces = [
+            King(Column.G, Row._8, Color.BLACK),
+            Pawn(Column.D, Row._5, Color.BLACK),
+            Pawn(Column.E, Row._6, Color.BLACK),
+        ]
+        b = Board(white_pieces + black_pieces)
+        white = Player(Color.WHITE, white_pieces)
+        black = Player(Color.BLACK, black_pieces)
+
+        # Material alone would take the pawn
+        assert 7 == white.value(b, black)
+        assert 7 == white.quiescence(b, black, -INF, INF, Search())
+        moves, score = white.minimax(b, black, 1)
+        assert (Index(Column.D, Row._1), Index(Column.D, Row._5)) not in moves
+        assert 7 == score
+
+    def test_quiescence_stand_pat(self):
+        chess = Chess()
+        search = Search()
+        assert 0 == chess.white.quiescence(
+            chess.board, chess.black, -INF, INF, search
+        )
+        assert 1 == search.nodes
+
+    @pytest.mark.parametrize(
+        "white_pieces, move, expected",
+        [
+            # Free pawn
+            ([Knight(Column.F, Row._3, Color.WHITE)], ("f3", "e5"), 1),
+            # Pawn defended by the rook
+            ([Rook(Column.D, Row._2, Color.WHITE)], ("d2", "d5"), -4),
+            # Rook behind joins in once the first one has gone
+            (
+                [
+                    Rook(Column.D, Row._2, Color.WHITE),
+                    Rook(Column.D, Row._1, Color.WHITE),
+                ],
+                ("d2", "d5"),
+                1,
+            ),
+            # Knight for knight, the pawn recaptures
+            ([Knight(Column.E, Row._4, Color.WHITE)], ("e4", "c5"), 0),
+            # Quiet move onto a square the pawn attacks
+            ([Knight(Column.E, Row._4, Color.WHITE)], ("e4", "c3"), 0),
+            ([Knight(Column.C, Row._2, Color.WHITE)], ("c2", "d4"), -3),
+        ],
+    )
+    def test_see(self, white_pieces, move, expected):
+        black_pieces = [
+            Rook(Column.D, Row._8, Color.BLACK),
+            Pawn(Column.D, Row._5, Color.BLACK),
+            Pawn(Column.A, Row._5, Color.BLACK),
+            Knight(Column.C, Row._5, Color.BLACK),
+            Pawn(Column.B, Row._6, Color.BLACK),
+            Pawn(Column.E, Row._5, Color.BLACK),
+        ]
+        src, dst = (
+            Index(Column[square[0].upper()], Row(int(square[1]) - 1))
+            for square in move
+        )
+        for bitboards in (True, False):
+            b = Board(white_pieces + black_pieces, bitboards=bitboards)
+            before = copy.deepcopy(b)
+            assert expected == components.see(b, src, dst)
+            assert before == b
+
+    def test_capture_moves(self):
+        white_pieces = [
+            King(Column.G, Row._2, Color.WHITE),
+            Rook(Column.D, Row._1, Color.WHITE),
+            Pawn(Column.E, Row._4, Color.WHITE),
+        ]
+        black_pieces = [
+            King(Column.G, Row._8, Color.BLACK),
+            Pawn(Column.D, Row._5, Color.BLACK),
+            Pawn(Column.E, Row._5, Color.BLACK),
+        ]
+        b = Board(white_pieces + black_pieces)
+        white = Player(Color.WHITE, white_pieces)
+        black = Player(Color.BLACK, black_pieces)
+        captures = white.get_pseudo_captures(b, black)
+        assert {
+            encode_move(Index(Column.D, Row._1), Index(Column.D, Row._5)),
+            encode_move(Index(Column.E, Row._4), Index(Column.D, Row._5)),
+        } == set(white.get_legal_moves(captures, b, black))
+
+    def _material_up_position(self):
+        white_pieces = [
+            King(Column.G, Row._1, Color.WHITE),
+            Queen(Column.D, Row._1, Color.WHITE),
+            Knight(Column.C, Row._3, Color.WHITE),
+            Pawn(Column.F, Row._2, Color.WHITE),
+            Pawn(Column.G, Row._2, Color.WHITE),
+            Pawn(Column.H, Row._2, Color.WHITE),
+        ]
+        black_pieces = [
+            King(Column.G, Row._8, Color.BLACK),
+            Knight(Column.C, Row._6, Color.BLACK),
+            Pawn(Column.F, Row._7, Color.BLACK),
+            Pawn(Column.G, Row._7, Color.BLACK),
+            Pawn(Column.H, Row._7, Color.BLACK),
+        ]
+        b = Board(white_pieces + black_pieces)
+        white = Player(Color.WHITE, white_pieces)
+        black = Player(Color.BLACK, black_pieces)
+        return b, white, black
+
+    def test_null_move_pruning_saves_nodes(self, monkeypatch):
+        b, white, black = self._material_up_position()
+        pruned = Search()
+        _, score = white.minimax(b, black, 4, search=pruned)
+
+        monkeypatch.setattr(components, "NULL_MOVE_MIN_DEPTH", 99)
+        full = Search()
+        _, full_score = white.minimax(b, black, 4, search=full)
+        assert full_score == score
+        assert pruned.nodes < full.nodes
+
+    def test_null_move_verification(self, monkeypatch):
+        monkeypatch.setattr(components, "NULL_MOVE_VERIFY_DEPTH", 3)
+        b, white, black = self._material_up_position()
+        before = copy.deepcopy(b)
+        search = Search()
+        search.null_verify = True
+        _, score = white.minimax(b, black, 4, search=search)
+        assert score >= 8
+        assert before == b
+
+    def test_late_move_reductions_save_nodes(self, monkeypatch):
+        b, white, black = self._material_up_position()
+        before = copy.deepcopy(b)
+        reduced = Search()
+        _, score = white.minimax(b, black, 4, search=reduced)
+        assert before == b
+
+        # Fresh pieces, searching shuffles the order moves are generated in
+        b, white, black = self._material_up_position()
+        monkeypatch.setattr(components, "LMR_MIN_DEPTH", 99)
+        full = Search()
+        _, full_score = white.minimax(b, black, 4, search=full)
+        assert full_score == score
+        assert reduced.nodes < full.nodes
+
+    def test_late_move_reduction_table(self):
+        table = components.LMR_TABLE
+        assert 0 == table[1][1]
+        assert 1 == table[3][3]
+        for depth in range(2, len(table)):
+            for moves in range(2, 63):
+                assert table[depth][moves] <= table[depth][moves + 1]
+
+    @pytest.mark.parametrize("guess", [-20, 0, 3, 20])
+    def test_aspiration_search(self, guess):
+        b, white, black = self._material_up_position()
+        expected_moves, expected = white.minimax(b, black, 2)
+        moves, score = white.aspiration_search(b, black, 2, guess, Search())
+        assert expected == score
+        assert set(expected_moves) == set(moves)
+
+    def test_principal_variation_search_matches_full_width(self):
+        b, white, black = self._material_up_position()
+        expected_moves, expected = full_width_minimax(white, b, black, 2)
+        moves, score = white.minimax(b, black, 2)
+        assert expected == score
+        assert set(expected_moves) == set(moves)
+
+    def test_frontier_pruning_saves_nodes(self, monkeypatch):
+        b, white, black = self._material_up_position()
+        before = copy.deepcopy(b)
+        pruned = Search()
+        _, score = white.minimax(b, black, 3, search=pruned)
+        assert before == b
+
+        b, white, black = self._material_up_position()
+        monkeypatch.setattr(components, "FRONTIER_DEPTH", 0)
+        full = Search()
+        _, full_score = white.minimax(b, black, 3, search=full)
+        assert full_score == score
+        assert pruned.nodes < full.nodes
+
+    def test_frontier_margins_from_options(self):
+        go = {"depth": 1, "options": {"FutilityMargin": 5, "RazorMargin": 0}}
+        search = Search.from_go(go, Color.WHITE)
+        assert 5 == search.futility_margin
+        assert 0 == search.razor_margin
+        assert components.REVERSE_FUTILITY_MARGIN == (
+            search.reverse_futility_margin
+        )
+
+    def test_is_mate_score(self):
+        assert components.is_mate_score(components.MATE - 3)
+        assert components.is_mate_score(-components.MATE + 4)
+        assert not components.is_mate_score(39)
+
+    def test_mate_in(self):
+        mate = components.MATE
+        assert 1 == components.mate_in(mate - 1)
+        assert 2 == components.mate_in(mate - 3)
+        assert -1 == components.mate_in(-mate + 2)
+        assert components.mate_in(12) is None
+
+    @pytest.mark.parametrize("ply", [0, 3])
+    def test_mate_score_tt_round_trip(self, ply):
+        for score in [components.MATE - 5, -components.MATE + 6, 7]:
+            stored = components.score_to_tt(score, ply)
+            assert score == components.score_from_tt(stored, ply)
+        assert components.MATE - 2 == components.score_from_tt(
+            components.score_to_tt(components.MATE - 5, 4), 1
+        )
+
+    def _corner_position(self, white_pieces):
+        black_pieces = [King(Column.H, Row._8, Color.BLACK)]
+        # A king in the corner would otherwise be taken for a castling rook
+        black_pieces[0].has_moved = True
+        b = Board(white_pieces + black_pieces)
+        white = Player(Color.WHITE, white_pieces)
+        black = Player(Color.BLACK, black_pieces)
+        return b, white, black
+
+    def test_minimax_mate_in_one(self):
+        b, white, black = self._corner_position(
+            [
+                King(Column.F, Row._6, Color.WHITE),
+                Queen(Column.A, Row._7, Color.WHITE),
+            ]
+        )
+        moves, score = white.minimax(b, black, 1)
+        assert components.MATE - 1 == score
+        assert 1 == components.mate_in(score)
+        assert (Index(Column.A, Row._7), Index(Column.G, Row._7)) in moves
+
+    def test_minimax_prefers_quicker_mate(self):
+        b, white, black = self._corner_position(
+            [
+                King(Column.F, Row._6, Color.WHITE),
+                Queen(Column.A, Row._7, Color.WHITE),
+            ]
+        )
+        _, score = white.minimax(b, black, 3)
+        assert components.MATE - 1 == score
+
+    def test_minimax_stalemate(self):
+        b, white, black = self._corner_position(
+            [
+                King(Column.F, Row._7, Color.WHITE),
+                Queen(Column.G, Row._6, Color.WHITE),
+            ]
+        )
+        assert ([], 0) == black.minimax(b, white, 2)
+
+    def test_get_best_move_when_mated(self):
+        b, white, black = self._corner_position(
+            [
+                King(Column.F, Row._6, Color.WHITE),
+                Queen(Column.G, Row._7, Color.WHITE),
+            ]
+        )
+        move, score, _, moves = black.get_best_move(b, white, Search(2))
+        assert "0000" == move
+        assert -components.MATE == score
+        assert [] == moves
+
+    def test_has_non_pawn_material(self):
+        b, white, black = self._material_up_position()
+        assert white.has_non_pawn_material(b)
+        pawns = [King(Column.A, Row._1, Color.WHITE)]
+        pawns.append(Pawn(Column.B, Row._2, Color.WHITE))
+        assert not Player(Color.WHITE, pawns).has_non_pawn_material(
+            Board(pawns)
+        )
+
+    def test_get_best_move_deadline(self):
+        chess = Chess()
+        search = Search(soft_limit=0.05, hard_limit=0.2)
+        move, _, _, _ = chess.white.get_best_move(
+            chess.board, chess.black, search
+        )
+        assert move
+        assert search.elapsed() < 1
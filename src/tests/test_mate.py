@@ -0,0 +1,124 @@
+import copy
+from ..game import Chess
+from ..components import (
+    Color,
+    Row,
+    Column,
+    Board,
+    Player,
+    Rook,
+    Queen,
+    King,
+    Index,
+    Search,
+    encode_move,
+)
+from ..mate import Node, expand, find_mate, mating_line, prove
+from ..uci import parse_command
+
+
+def position(white_pieces, black_king=Index(Column.H, Row._8)):
+    black_pieces = [King(black_king.x, black_king.y, Color.BLACK)]
+    # Kings off their start squares would be taken for castling rooks
+    for piece in white_pieces + black_pieces:
+        if isinstance(piece, King):
+            piece.has_moved = True
+    board = Board(white_pieces + black_pieces)
+    return (
+        board,
+        Player(Color.WHITE, white_pieces),
+        Player(Color.BLACK, black_pieces),
+    )
+
+
+def rooks():
+    """Mate in two starting with a quiet move, Ra7 Kg8 Rb8"""
+    return position(
+        [
+            King(Column.A, Row._1, Color.WHITE),
+            Rook(Column.A, Row._6, Color.WHITE),
+            Rook(Column.B, Row._5, Color.WHITE),
+        ]
+    )
+
+
+class TestMate:
+    def test_mate_in_one(self):
+        board, white, black = position(
+            [
+                King(Column.F, Row._6, Color.WHITE),
+                Queen(Column.A, Row._7, Color.WHITE),
+            ]
+        )
+        before = copy.deepcopy(board)
+        root = prove(white, board, black, 1, Search())
+        assert before == board
+        assert [
+            (Index(Column.A, Row._7), Index(Column.G, Row._7))
+        ] == mating_line(root)
+
+    def test_quiet_move(self):
+        board, white, black = rooks()
+        assert prove(white, board, black, 1, Search()) is None
+        root = prove(white, board, black, 2, Search())
+        assert root is not None
+        line = mating_line(root)
+        assert 3 == len(line)
+        assert Index(Column.A, Row._6) == line[0][0]
+
+    def test_find_mate_shortest(self, capsys):
+        board, white, black = rooks()
+        line = find_mate(white, board, black, 4, Search())
+        assert 3 == len(line)
+        assert "score mate 2 " in capsys.readouterr().out
+
+    def test_find_mate_none(self, capsys):
+        chess = Chess()
+        line = find_mate(chess.white, chess.board, chess.black, 2, Search())
+        assert line is None
+        assert "info string no mate in 2" in capsys.readouterr().out
+
+    def test_last_move_checks(self):
+        board, white, black = rooks()
+        node = Node()
+        expand(node, white, board, black, 2, 2)
+        # Ra8, Rb8, Rh5 and Rh6, no quiet moves
+        assert 4 == len(node.children)
+        for child in node.children:
+            move = encode_move(*child.move)
+            undo = white.do_move_fast(move, board, black)
+            assert black.in_check(board, white)
+            white.undo_move_fast(move, board, black, undo)
+
+    def test_prove_skips_quiet_last_moves(self):
+        board, white, black = rooks()
+        search = Search()
+        assert prove(white, board, black, 2, search) is not None
+        assert search.nodes < 40
+
+    def test_find_mate_stopped(self, capsys):
+        board, white, black = rooks()
+        search = Search(nodes=5)
+        assert find_mate(white, board, black, 2, search) is None
+        assert search.stopped
+        out = capsys.readouterr().out
+        assert "info string mate search stopped at mate in 1" in out
+        assert "no mate" not in out
+
+    def test_chess_go_mate(self):
+        _, moves = parse_command("position startpos moves f2f3 e7e5 g2g4", {})
+        assert "d8h4" == Chess().get_best_move(moves, {"mate": "1"})
+
+    def test_chess_go_mate_shares_limits(self, capsys):
+        move = Chess().get_best_move([], {"mate": "3", "nodes": "200"})
+        assert "0000" != move
+        out = capsys.readouterr().out
+        assert "info string mate search stopped" in out
+        # The solver used up the nodes, the search gets no fresh budget
+        assert "info depth" not in out
+        assert "info nodes 201 " in out
+
+    def test_chess_go_mate_falls_back(self, capsys):
+        move = Chess().get_best_move([], {"mate": "1", "depth": 1})
+        assert 4 == len(move.split()[0])
+        assert "info string no mate in 1" in capsys.readouterr().out
@@ -0,0 +1,118 @@
+import copy
+import pytest
+from ..game import Chess
+from ..components import (
+    Color,
+    Row,
+    Column,
+    Board,
+    Player,
+    Queen,
+    King,
+    Index,
+    Search,
+    indices_to_uci_str,
+)
+from ..mcts import MCTS, Node, centipawns, winning_rate
+from ..uci import parse_command
+
+
+def pending(node: Node) -> int:
+    return node.pending + sum(pending(child) for child in node.children or [])
+
+
+class TestMCTS:
+    @pytest.mark.parametrize("score", [-9, -1, 0, 3])
+    def test_winning_rate(self, score):
+        assert 0 < winning_rate(score) < 1
+        assert score * 100 == centipawns(winning_rate(score))
+
+    def test_select_virtual_loss(self):
+        node = Node()
+        node.children = [Node(), Node()]
+        for child in node.children:
+            child.visits, child.value = 1, 0.5
+        node.visits = 2
+        node.children[0].pending = 1
+        assert node.children[1] is node.select()
+        node.children.append(Node())
+        assert node.children[2] is node.select()
+
+    def test_get_best_move(self):
+        chess = Chess()
+        before = copy.deepcopy(chess.board)
+        tree = MCTS()
+        search = Search(nodes=30)
+        move = tree.get_best_move(
+            [], chess.board, chess.white, chess.black, search
+        )
+        assert before == chess.board
+        assert 30 == search.nodes == tree.root.visits
+        assert search.pv[0] == tree.root.best().move
+        assert indices_to_uci_str(*tree.root.best().move) == move
+        assert 0 == pending(tree.root)
+
+    def test_tree_reuse(self):
+        tree = MCTS()
+        chess = Chess()
+        tree.get_best_move(
+            [], chess.board, chess.white, chess.black, Search(nodes=50)
+        )
+        _, moves = parse_command("position startpos moves e2e4", {})
+        child = next(
+            child
+            for child in tree.root.children
+            if (Index(Column.E, Row._2), Index(Column.E, Row._4))
+            == child.move
+        )
+        visits = child.visits
+        chess.play(moves)
+        search = Search(nodes=10)
+        tree.get_best_move(
+            moves, chess.board, chess.black, chess.white, search
+        )
+        assert child is tree.root
+        assert visits + 10 == child.visits
+
+    def test_mated(self):
+        black_pieces = [King(Column.H, Row._8, Color.BLACK)]
+        white_pieces = [
+            King(Column.F, Row._6, Color.WHITE),
+            Queen(Column.G, Row._7, Color.WHITE),
+        ]
+        for piece in black_pieces + white_pieces:
+            piece.has_moved = True
+        board = Board(white_pieces + black_pieces)
+        white = Player(Color.WHITE, white_pieces)
+        black = Player(Color.BLACK, black_pieces)
+        tree = MCTS()
+        move = tree.get_best_move([], board, black, white, Search(nodes=5))
+        assert "0000" == move
+        # Worth a win to the side that mated
+        assert 1.0 == tree.root.terminal
+
+    def test_chess_mcts_threads(self):
+        go = {"nodes": 20, "options": {"MCTS": True, "Threads": 2}}
+        tree = MCTS()
+        move = Chess().get_best_move([], go, tree=tree)
+        assert 4 == len(move.split()[0])
+        assert 20 == tree.root.visits
+        assert 0 == pending(tree.root)
+
+    def test_no_playout_back(self):
+        chess = Chess()
+        tree = MCTS()
+        # Out of time before the pool has evaluated anything
+        search = Search(soft_limit=0)
+        move = tree.get_best_move(
+            [], chess.board, chess.white, chess.black, search, threads=2
+        )
+        assert "0000" != move
+        assert search.pv[0] == tree.root.best().move
+        assert 0 == pending(tree.root)
+
+    def test_depth_budget(self):
+        go = {"depth": 1, "options": {"MCTS": True}}
+        tree = MCTS()
+        Chess().get_best_move([], go, tree=tree)
+        assert 200 == tree.root.visits
@@ -0,0 +1,59 @@
+import threading
+import pytest
+from ..game import Chess
+from ..components import MoveOrder, Search
+from ..transposition import TranspositionTable
+from ..smp import Helpers, perturb
+
+
+class TestSMP:
+    def test_perturb(self):
+        orders = [MoveOrder() for _ in range(3)]
+        for seed, order in zip([1, 1, 2], orders):
+            perturb(order, seed)
+        history = [order.history for order in orders]
+        assert history[0] == history[1]
+        assert history[0] != history[2]
+        assert all(0 <= value < 16 for value in history[0][1])
+
+    def test_helpers_need_shared_table(self):
+        with pytest.raises(ValueError):
+            Helpers([], {}, TranspositionTable(1), 1)
+
+    def test_helpers_fill_table(self):
+        tt = TranspositionTable(1, shared=True)
+        try:
+            helpers = Helpers([], {"infinite": True}, tt, 2)
+            search = Search()
+            helpers.attach(search)
+            try:
+                while sum(helpers.shared_nodes) < 2 * 64:
+                    assert all(p.is_alive() for p in helpers.processes)
+                    helpers.processes[0].join(0.05)
+                assert search.total_nodes() > 0
+            finally:
+                helpers.stop()
+            assert not any(p.is_alive() for p in helpers.processes)
+            assert any(tt.table)
+        finally:
+            tt.close()
+
+    def test_chess_threads(self):
+        tt = TranspositionTable(1, shared=True)
+        try:
+            go = {"depth": 2, "options": {"Threads": 3}}
+            move = Chess().get_best_move([], go, tt, MoveOrder())
+            assert 4 == len(move.split()[0])
+        finally:
+            tt.close()
+
+    def test_search_stop_event(self):
+        stop_event = threading.Event()
+        search = Search()
+        search.stop_event = stop_event
+        for _ in range(64):
+            assert not search.tick()
+        stop_event.set()
+        while not search.tick():
+            pass
+        assert search.nodes <= 2 * 64
@@ -0,0 +1,92 @@
+from ..transposition import (
+    TranspositionTable,
+    BOUND_EXACT,
+    BOUND_LOWER,
+    BOUND_UPPER,
+    ENTRY_BYTES,
+    pack,
+    unpack,
+)
+
+
+class TestTranspositionTable:
+    def test_pack_round_trip(self):
+        for score in (-30000, -1, 0, 7, 30000):
+            data = pack(12, BOUND_UPPER, score, 0xABC, 5)
+            assert (12, BOUND_UPPER, score, 0xABC, 5) == unpack(data)
+
+    def test_size(self):
+        tt = TranspositionTable(1)
+        assert (1 << 20) // ENTRY_BYTES == tt.size
+        assert 1 << 20 == len(tt.table) * tt.table.itemsize
+
+    def test_store_probe(self):
+        tt = TranspositionTable(1)
+        key = 0x123456789ABCDEF0
+        assert tt.probe(key) is None
+        tt.store(key, 3, BOUND_LOWER, -4, 77)
+        assert (3, BOUND_LOWER, -4, 77) == tt.probe(key)
+        assert tt.probe(key + tt.size) is None
+
+    def test_same_key_keeps_move(self):
+        tt = TranspositionTable(1)
+        tt.store(42, 2, BOUND_EXACT, 1, 99)
+        tt.store(42, 1, BOUND_UPPER, 0, 0)
+        assert (1, BOUND_UPPER, 0, 99) == tt.probe(42)
+
+    def test_replacement_prefers_depth(self):
+        tt = TranspositionTable(1)
+        other = 42 + tt.size
+        tt.store(42, 5, BOUND_EXACT, 1, 99)
+        tt.store(other, 2, BOUND_EXACT, 1, 99)
+        assert tt.probe(other) is None
+        assert tt.probe(42)
+
+    def test_replacement_ages(self):
+        tt = TranspositionTable(1)
+        other = 42 + tt.size
+        tt.store(42, 5, BOUND_EXACT, 1, 99)
+        tt.new_search()
+        tt.store(other, 2, BOUND_EXACT, 1, 99)
+        assert tt.probe(42) is None
+        assert tt.probe(other)
+
+    def test_clear(self):
+        tt = TranspositionTable(1)
+        tt.store(42, 5, BOUND_EXACT, 1, 99)
+        assert tt.hashfull() > 0
+        table = tt.table
+        tt.clear()
+        # In place, without a second table
+        assert table is tt.table
+        assert tt.probe(42) is None
+        assert 0 == tt.hashfull()
+        assert not any(tt.table)
+        tt.close()
+        assert 0 == len(tt.table)
+
+    def test_torn_entry_fails_probe(self):
+        tt = TranspositionTable(1)
+        other = 42 + tt.size
+        tt.store(42, 5, BOUND_EXACT, 1, 99)
+        # Data word of another position's entry, as a racing writer leaves it
+        tt.table[(42 << 1) + 1] = pack(7, BOUND_LOWER, 3, 12, tt.age)
+        assert tt.probe(42) is None
+        assert tt.probe(other) is None
+
+    def test_shared(self):
+        tt = TranspositionTable(1, shared=True)
+        try:
+            assert tt.name
+            attached = TranspositionTable(1, name=tt.name)
+            tt.store(42, 5, BOUND_EXACT, 1, 99)
+            assert (5, BOUND_EXACT, 1, 99) == attached.probe(42)
+            attached.store(43, 2, BOUND_UPPER, -1, 0)
+            assert (2, BOUND_UPPER, -1, 0) == tt.probe(43)
+            tt.clear()
+            assert attached.probe(42) is None
+            attached.close()
+        finally:
+            tt.close()
+        assert tt.name is None
+        assert TranspositionTable(1).name is None
@@ -1,13 +1,77 @@
+import logging
+import subprocess
+import sys
+import threading
+import time
 import pytest
+from pathlib import Path
 from unittest.mock import patch
 from typing import List
-from ..uci import position_valid_or_raise, parse_command, main
+from ..uci import (
+    position_valid_or_raise,
+    parse_command,
+    main,
+    score_str,
+    fallback_move,
+    SearchThread,
+)
+from ..transposition import TranspositionTable
 
 
 def addln(str_list: List[str]):
     return list(map(lambda x: f"{x}\n", str_list))
 
 
+class Engine:
+    """uci.py in its own process, talked to over a pipe as a GUI would"""
+
+    def __init__(self):
+        source = Path(__file__).parent.parent
+        self.process = subprocess.Popen(
+            [sys.executable, "uci.py"],
+            cwd=source,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        # Fail rather than hang if it stops answering
+        self.watchdog = threading.Timer(120, self.process.kill)
+        self.watchdog.daemon = True
+        self.watchdog.start()
+
+    def send(self, cmd: str):
+        self.process.stdin.write(f"{cmd}\n")
+        self.process.stdin.flush()
+
+    def read_until(self, prefix: str) -> List[str]:
+        """Lines up to and including the first starting with prefix"""
+        lines = []
+        while not lines or not lines[-1].startswith(prefix):
+            line = self.process.stdout.readline()
+            assert line, f"engine exited waiting for {prefix}"
+            lines.append(line.strip())
+        return lines
+
+    def go(self, cmd: str) -> (List[str], float):
+        """Lines sent up to bestmove and the seconds they took"""
+        start = time.monotonic()
+        self.send(cmd)
+        lines = self.read_until("bestmove")
+        return lines, time.monotonic() - start
+
+    def quit(self) -> str:
+        """Quit, returning what was sent to stderr"""
+        _, err = self.process.communicate("quit\n", timeout=10)
+        assert 0 == self.process.returncode
+        return err
+
+    def close(self):
+        self.watchdog.cancel()
+        self.process.kill()
+        self.process.wait()
+
+
 DEFAULT_START = addln(
     [
         "uci",
@@ -44,6 +108,50 @@ CASTLE_2 = DEFAULT_START + addln(
     ]
 )
 
+HASH_OPTION = addln(
+    [
+        "uci",
+        "setoption name Hash value 2",
+        "isready",
+        "ucinewgame",
+        "position startpos moves e2e4",
+        "go depth 3",
+        "position startpos moves e2e4 e7e5 g1f3",
+        "go depth 3",
+    ]
+)
+
+STOP_INFINITE = addln(
+    [
+        "uci",
+        "isready",
+        "position startpos moves e2e4",
+        "go infinite",
+        "isready",
+        "stop",
+    ]
+)
+
+PONDERHIT = addln(
+    [
+        "uci",
+        "isready",
+        "position startpos moves e2e4 e7e5",
+        "go ponder wtime 3000 btime 3000",
+        "ponderhit",
+    ]
+)
+
+PONDER_STOP = addln(
+    [
+        "uci",
+        "isready",
+        "position startpos moves e2e4 e7e5",
+        "go ponder wtime 300000 btime 300000",
+        "stop",
+    ]
+)
+
 RANDO_CRASH_1 = DEFAULT_START + addln(
     [
         "position startpos moves e2e3 h7h5 g1f3 f7f5 f3h4 "
@@ -142,6 +250,17 @@ RANDO_CRASH_10 = DEFAULT_START + addln(
 
 
 class TestUCI:
+    @pytest.fixture(autouse=True)
+    def no_errors(self, caplog):
+        """Searches don't raise out of main(), check they logged nothing"""
+        yield
+        errors = [
+            record
+            for record in caplog.get_records("call")
+            if record.levelno >= logging.ERROR
+        ]
+        assert not errors
+
     def _main(self):
         try:
             main()
@@ -174,10 +293,267 @@ class TestUCI:
         captured = capsys.readouterr()
         assert "readyok" in captured.out
 
+    def test_parse_command_go_resets_limits(self):
+        state = {"ponder": None, "last": None}
+        parse_command("go depth 3 movetime 100", state)
+        parse_command("go wtime 1000 btime 1000", state)
+        assert 0 == state["depth"]
+        assert 0 == state["movetime"]
+        assert "1000" == state["wtime"]
+
+    def test_parse_command_go_searchmoves(self):
+        state = {"ponder": None, "last": None}
+        parse_command("go searchmoves e2e4 d2d4 depth 3", state)
+        assert ["e2e4", "d2d4"] == state["searchmoves"]
+        assert "3" == state["depth"]
+        parse_command("go depth 3", state)
+        assert state["searchmoves"] is None
+
+    def test_parse_command_go_mate(self):
+        state = {"ponder": None, "last": None}
+        parse_command("go mate 3", state)
+        assert "3" == state["mate"]
+        parse_command("go depth 3", state)
+        assert 0 == state["mate"]
+
+    def test_parse_command_setoption(self, capsys):
+        state = {"ponder": None, "last": None}
+        parse_command("uci", state)
+        assert "option name Hash type spin" in capsys.readouterr().out
+        parse_command("setoption name Hash value 64", state)
+        assert 64 == state["options"]["Hash"]
+        parse_command("setoption name Hash value 0", state)
+        assert 1 == state["options"]["Hash"]
+        parse_command("setoption name Threads value 4", state)
+        assert 4 == state["options"]["Threads"]
+        parse_command("setoption name MultiPV value 3", state)
+        assert 3 == state["options"]["MultiPV"]
+        parse_command("setoption name Ponder value true", state)
+        assert state["options"]["Ponder"] is True
+        parse_command("setoption name MCTS value true", state)
+        assert state["options"]["MCTS"] is True
+
+    def test_parse_command_setoption_invalid(self):
+        state = {"ponder": None, "last": None}
+        parse_command("setoption name Hash value 64", state)
+        parse_command("setoption name MCTS value true", state)
+        parse_command("setoption name Hash value lots", state)
+        parse_command("setoption name Threads value 2.5", state)
+        parse_command("setoption name MCTS value yes", state)
+        parse_command("setoption name Threads value 9999", state)
+        assert {"Hash": 64, "MCTS": True, "Threads": 256} == state["options"]
+
+    def test_search_thread_holds_bestmove(self, capsys):
+        searcher = SearchThread(lambda stop, ponderhit: "e2e4", wait=True)
+        searcher.start()
+        searcher.join(0.1)
+        assert searcher.is_alive()
+        assert "bestmove" not in capsys.readouterr().out
+        searcher.ponderhit()
+        searcher.join()
+        assert "bestmove e2e4" in capsys.readouterr().out
+
+    def test_main_threads_over_pipe(self):
+        """Helpers start and stop while the input loop waits on stdin"""
+
+        def nodes(lines: List[str]) -> int:
+            info = [line.split() for line in lines if " nodes " in line]
+            return int(info[-1][info[-1].index("nodes") + 1])
+
+        engine = Engine()
+        try:
+            engine.send("uci")
+            engine.read_until("uciok")
+            engine.send("position startpos moves e2e4")
+            single, _ = engine.go("go nodes 4000")
+
+            engine.send("setoption name Threads value 3")
+            engine.send("ucinewgame")
+            engine.send("position startpos moves e2e4")
+            threaded, _ = engine.go("go nodes 4000")
+            # The main search stops at its own count, helpers add theirs
+            assert nodes(threaded) > nodes(single)
+
+            lines, seconds = engine.go("go movetime 500")
+            assert seconds < 1.5
+            assert "bestmove 0000" not in lines[-1]
+            # Quitting frees the shared hash table
+            assert "leaked" not in engine.quit()
+        finally:
+            engine.close()
+
+    def test_main_mcts_threads_over_pipe(self):
+        engine = Engine()
+        try:
+            engine.send("setoption name MCTS value true")
+            engine.send("setoption name Threads value 3")
+            engine.send("position startpos moves e2e4")
+            lines, seconds = engine.go("go movetime 1500")
+            assert seconds < 3
+            assert any(line.startswith("info depth") for line in lines)
+            assert "bestmove 0000" not in lines[-1]
+            engine.quit()
+        finally:
+            engine.close()
+
+    def test_search_thread_error(self, capsys, caplog):
+        def search(stop, ponderhit):
+            raise RuntimeError("search failed")
+
+        searcher = SearchThread(search, fallback=lambda: "e2e4")
+        searcher.start()
+        searcher.join()
+        assert isinstance(searcher.error, RuntimeError)
+        assert "bestmove e2e4" in capsys.readouterr().out
+        assert "search failed" in caplog.text
+        caplog.clear()
+
+    def test_fallback_move(self):
+        import game
+        from components import indices_to_uci_str
+
+        _, moves = parse_command("position startpos moves e2e4 d7d5", {})
+        chess = game.Chess()
+        chess.play(moves)
+        player, other_player = chess.players()
+        legal = player.get_possible_moves_index(chess.board, other_player)
+        assert indices_to_uci_str(*legal[0]) == fallback_move(moves)
+
+        # The best move of a search, found in the table
+        tt = TranspositionTable(1)
+        chess.get_best_move([], {"depth": 2}, tt)
+        _, _, _, move = tt.probe(player.position_key(chess.board))
+        best = player.get_pseudo_legal_move(chess.board, other_player, move)
+        assert best != legal[0]
+        assert indices_to_uci_str(*best) == fallback_move(moves, tt)
+
+    def test_main_search_error(self, capsys, caplog):
+        import game
+
+        get_best_move = game.Chess.get_best_move
+        calls = []
+
+        def fail_once(chess, *args, **kwargs):
+            calls.append(len(chess.moves))
+            if 1 == len(calls):
+                # Fail mid-search, the board left as it is
+                chess.white.do_move_fast(
+                    12 | 28 << 6, chess.board, chess.black
+                )
+                raise RuntimeError("search failed")
+            return get_best_move(chess, *args, **kwargs)
+
+        lines = addln(
+            [
+                "position startpos",
+                "go depth 2",
+                "position startpos moves e2e4",
+                "go depth 2",
+                "isready",
+            ]
+        )
+        with patch("builtins.input", side_effect=lines), patch.object(
+            game.Chess, "get_best_move", fail_once
+        ):
+            self._main()
+        out = capsys.readouterr().out
+        moves = [
+            line.split()[1]
+            for line in out.splitlines()
+            if line.startswith("bestmove")
+        ]
+        assert 2 == len(moves)
+        assert "0000" not in moves
+        # The second search starts over from a new game
+        assert [0, 0] == calls
+        assert "search failed" in caplog.text
+        caplog.clear()
+
+    def test_score_str(self):
+        assert "cp -150" == score_str(-150)
+        assert "mate 2" == score_str(3090000, 2)
+        assert "mate -1" == score_str(-3099800, -1)
+
     @patch("builtins.input", side_effect=DEFAULT_START)
     def test_main(self, _input):
         self._main()
 
+    @patch("builtins.input", side_effect=HASH_OPTION)
+    def test_main_hash_option(self, _input):
+        self._main()
+
+    @patch("builtins.input", side_effect=PONDERHIT)
+    def test_main_ponderhit(self, _input, capsys):
+        start = time.monotonic()
+        self._main()
+        assert time.monotonic() - start < 10
+        out = capsys.readouterr().out
+        assert "option name Ponder type check default false" in out
+        assert " ponder " in out.split("bestmove")[-1]
+
+    @patch("builtins.input", side_effect=PONDER_STOP)
+    def test_main_ponder_stop(self, _input, capsys):
+        start = time.monotonic()
+        self._main()
+        assert time.monotonic() - start < 10
+        assert "bestmove" in capsys.readouterr().out
+
+    @patch("builtins.input", side_effect=STOP_INFINITE)
+    def test_main_stop_infinite(self, _input, capsys):
+        start = time.monotonic()
+        self._main()
+        assert time.monotonic() - start < 10
+        out = capsys.readouterr().out
+        # Ready while searching, the best move comes when stopped
+        assert out.rindex("readyok") < out.index("bestmove")
+        assert "bestmove 0000" not in out
+
+    @patch(
+        "builtins.input",
+        side_effect=addln(
+            [
+                "position startpos moves e2e4 e7e5 g1f3 b8c6 f1c4 g8f6 d2d4 "
+                "e5d4 e1g1 f6e4 f1e1 d7d5 c4d5 d8d5 b1c3 d5a5 c3e4 c8e6",
+                "go infinite",
+                "stop",
+            ]
+        ),
+    )
+    def test_main_stop_at_once(self, _input, capsys, monkeypatch):
+        import components
+        import game
+
+        get_best_move = game.Chess.get_best_move
+
+        def after_stop(chess, *args, **kwargs):
+            # Search once stopped, which is noticed at the first node
+            stop_event = args[4]
+            stop_event.wait()
+            return get_best_move(chess, *args, **kwargs)
+
+        monkeypatch.setattr(components, "CHECK_INTERVAL", 1)
+        monkeypatch.setattr(game.Chess, "get_best_move", after_stop)
+        self._main()
+        out = capsys.readouterr().out
+        assert "bestmove" in out
+        assert "bestmove 0000" not in out
+
+    @patch("builtins.input", side_effect=MOVE_TWO)
+    def test_main_keeps_game(self, _input):
+        import game
+
+        played = []
+        play = game.Chess.play
+
+        def record(chess, moves):
+            played.append(len(moves))
+            play(chess, moves)
+
+        with patch.object(game.Chess, "play", record):
+            self._main()
+        # The second search only plays the moves since the first
+        assert [1, 2] == played
+
     @patch("builtins.input", side_effect=CASTLE_1)
     def test_main_castle1(self, _input):
         self._main()
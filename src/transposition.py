@@ -0,0 +1,169 @@
+"""Fixed-size transposition table
+
+Entries live in a flat array of unsigned 64-bit words, two words per entry:
+the full Zobrist key of the position xor its packed data, followed by the
+packed data.
+
+    bits  0-15  score, offset by SCORE_OFFSET
+    bits 16-23  depth
+    bits 24-25  bound
+    bits 26-31  age (search generation)
+    bits 32-47  best move, 0 if none
+
+This keeps memory use at ENTRY_BYTES per entry regardless of Python object
+overhead, so the table size is exactly what the Hash option asks for.
+
+The table may live in shared memory, searched by several processes at once
+without locking. Two processes writing the same entry can leave it with the
+key word of one and the data word of the other; xoring the data into the key
+word makes such a torn entry fail the key check on probe instead of handing
+out another position's data.
+"""
+
+from array import array
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+BOUND_EXACT = 0
+BOUND_LOWER = 1
+BOUND_UPPER = 2
+
+ENTRY_BYTES = 16
+SCORE_OFFSET = 1 << 15
+AGE_MASK = 0x3F
+
+DEFAULT_HASH_MB = 16
+
+# Bytes clear() zeroes at a time, all the scratch memory it needs
+CLEAR_CHUNK = 1 << 20
+
+
+def pack(depth: int, bound: int, score: int, move: int, age: int) -> int:
+    return (
+        (score + SCORE_OFFSET)
+        | depth << 16
+        | bound << 24
+        | (age & AGE_MASK) << 26
+        | move << 32
+    )
+
+
+def unpack(data: int) -> Tuple[int, int, int, int, int]:
+    """Return depth, bound, score, move and age of packed entry data"""
+    return (
+        data >> 16 & 0xFF,
+        data >> 24 & 0x3,
+        (data & 0xFFFF) - SCORE_OFFSET,
+        data >> 32 & 0xFFFF,
+        data >> 26 & AGE_MASK,
+    )
+
+
+class TranspositionTable:
+    """Direct-mapped table of search results keyed by Zobrist key
+
+    Replacement policy: an entry from an earlier search (see new_search())
+    is always replaced, an entry from the current search only by a result of
+    at least the same depth. The same position always overwrites itself,
+    keeping the old best move if the new result has none.
+
+    param megabytes: size of the table
+    param shared: allocate the table in shared memory
+    param name: attach to the shared table of that name instead, as made by
+        another process with shared=True
+    """
+
+    __slots__ = ["megabytes", "size", "table", "age", "shm", "owner"]
+
+    def __init__(
+        self,
+        megabytes: int = DEFAULT_HASH_MB,
+        shared: bool = False,
+        name: Optional[str] = None,
+    ):
+        self.megabytes = megabytes
+        self.size = max(megabytes * (1 << 20) // ENTRY_BYTES, 1)
+        self.age = 0
+        self.shm = None
+        self.owner = False
+        if name is not None:
+            self.shm = shared_memory.SharedMemory(name)
+        elif shared:
+            self.shm = shared_memory.SharedMemory(
+                create=True, size=self.size * ENTRY_BYTES
+            )
+            self.owner = True
+        if self.shm is None:
+            self.table = array("Q", [0]) * (self.size * ENTRY_BYTES // 8)
+        else:
+            self.table = self.shm.buf[: self.size * ENTRY_BYTES].cast("Q")
+
+    @property
+    def name(self) -> Optional[str]:
+        """Name of the shared memory block, None if not shared"""
+        return None if self.shm is None else self.shm.name
+
+    def close(self) -> None:
+        """Release the table, and shared memory, freeing it if this table
+        allocated it
+        """
+        if self.shm is None:
+            self.table = array("Q")
+            return
+        self.table.release()
+        self.table = array("Q")
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
+
+    def clear(self) -> None:
+        """Zero the table in place, CLEAR_CHUNK bytes at a time"""
+        with memoryview(self.table) as view, view.cast("B") as buffer:
+            zeros = bytes(min(CLEAR_CHUNK, len(buffer)))
+            for start in range(0, len(buffer), len(zeros)):
+                chunk = buffer[start : start + len(zeros)]
+                chunk[:] = zeros[: len(chunk)]
+                chunk.release()
+        self.age = 0
+
+    def new_search(self) -> None:
+        """Age existing entries, making them preferred for replacement"""
+        self.age = (self.age + 1) & AGE_MASK
+
+    def probe(self, key: int) -> Optional[Tuple[int, int, int, int]]:
+        """Return depth, bound, score and best move stored for key"""
+        slot = key % self.size << 1
+        data = self.table[slot + 1]
+        if self.table[slot] ^ data != key:
+            return None
+        depth, bound, score, move, _ = unpack(data)
+        return (depth, bound, score, move)
+
+    def store(
+        self, key: int, depth: int, bound: int, score: int, move: int
+    ) -> None:
+        slot = key % self.size << 1
+        table = self.table
+        old = table[slot + 1]
+        if table[slot] ^ old == key:
+            if not move:
+                move = old >> 32 & 0xFFFF
+        elif old:
+            old_depth, _, _, _, old_age = unpack(old)
+            if old_age == self.age and depth < old_depth:
+                return
+        data = pack(depth, bound, score, move, self.age)
+        table[slot] = key ^ data
+        table[slot + 1] = data
+
+    def hashfull(self) -> int:
+        """Permille of the first thousand entries used by this search"""
+        sample = min(self.size, 1000)
+        used = 0
+        for slot in range(1, sample << 1, 2):
+            if self.table[slot] and (
+                self.table[slot] >> 26 & AGE_MASK
+            ) == self.age:
+                used += 1
+        return used * 1000 // sample
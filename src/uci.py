@@ -4,9 +4,14 @@
 
 import traceback
 import os
+import sys
+import threading
 import logging as log
+from functools import partial
 from pathlib import Path
-from typing import Tuple, List, Union
+from typing import Tuple, List, Union, Optional, Callable
+
+from transposition import TranspositionTable, DEFAULT_HASH_MB
 
 ENGINE_NAME = "pychess"
 THIS = Path(__file__).parent
@@ -16,12 +21,62 @@ LOG_FILE = LOG_DIR / "uci.log"
 # the GUI I'm using sends "isready" after an invalid move. Detect.
 GAME_STARTED = False
 
+# go command fields, reset at every go so limits don't leak between moves
+GO_DEFAULTS = {
+    "wtime": 0,
+    "btime": 0,
+    "winc": 0,
+    "binc": 0,
+    "movestogo": 0,
+    "depth": 0,
+    "nodes": 0,
+    "movetime": 0,
+    "ponder": False,
+    "infinite": False,
+    "searchmoves": None,
+    "mate": 0,
+}
+
+# Options advertised in reply to "uci", set with "setoption"
+OPTIONS = {
+    "Hash": {
+        "type": "spin",
+        "default": DEFAULT_HASH_MB,
+        "min": 1,
+        "max": 4096,
+    },
+    # Frontier pruning margins, in pawns per ply
+    "FutilityMargin": {"type": "spin", "default": 2, "min": 0, "max": 20},
+    "ReverseFutilityMargin": {
+        "type": "spin",
+        "default": 2,
+        "min": 0,
+        "max": 20,
+    },
+    "RazorMargin": {"type": "spin", "default": 3, "min": 0, "max": 20},
+    # Search processes, see smp.py
+    "Threads": {"type": "spin", "default": 1, "min": 1, "max": 256},
+    # Tells the GUI we ponder, go ponder is what starts it
+    "Ponder": {"type": "check", "default": False},
+    # Best lines to report, see Player.get_best_move()
+    "MultiPV": {"type": "spin", "default": 1, "min": 1, "max": 256},
+    # Monte-Carlo tree search instead of minimax, see mcts.py
+    "MCTS": {"type": "check", "default": False},
+}
+
 
 def uci(cmd):
     log.debug(f"sending command: {cmd}")
     print(f"{cmd}\n", flush=True)
 
 
+def score_str(cp: int, mate: Optional[int] = None) -> str:
+    """Score as sent in info, mate in moves taking precedence"""
+    if mate is not None:
+        return f"mate {mate}"
+    return f"cp {cp}"
+
+
 def bestmove(position: str):
     """This is where the magic will happen, for now it only sends e5 as a
     possible move, assuming black, plus an info string
@@ -33,6 +88,107 @@ def bestmove(position: str):
     # bestmove.i += 1
 
 
+class SearchThread(threading.Thread):
+    """Search in the background, sending bestmove when done, so the input
+    loop can answer isready, stop and quit meanwhile
+
+    A ponder or infinite search that finishes early, on a forced move or the
+    depth limit, holds bestmove back until ponderhit or stop as UCI demands.
+    A search that raises is logged and kept in error, the move sent is then
+    fallback's, as the GUI waits for one.
+
+    param search: called with the Events that stop it and end pondering,
+        returns the move
+    param wait: hold bestmove back
+    param fallback: returns the move to send if search raises
+    """
+
+    def __init__(
+        self,
+        search: Callable[[threading.Event, threading.Event], str],
+        wait: bool = False,
+        fallback: Callable[[], str] = lambda: "0000",
+    ):
+        super().__init__(daemon=True)
+        self.search = search
+        self.fallback = fallback
+        self.stop_event = threading.Event()
+        self.ponderhit_event = threading.Event()
+        self.release = threading.Event()
+        if not wait:
+            self.release.set()
+        self.error = None
+
+    def run(self):
+        try:
+            move = self.search(self.stop_event, self.ponderhit_event)
+        except Exception as e:
+            log.error(e, exc_info=True)
+            self.error = e
+            try:
+                move = self.fallback()
+            except Exception as e:
+                log.error(e, exc_info=True)
+                move = "0000"
+        self.release.wait()
+        bestmove(move)
+
+    def ponderhit(self):
+        """The expected move was played, search on as a timed search"""
+        self.ponderhit_event.set()
+        self.release.set()
+
+    def stop(self):
+        """Stop the search early, it still sends the best move so far"""
+        self.stop_event.set()
+        self.release.set()
+        self.join()
+
+    def finish(self):
+        """Wait for the search, stopping it if it would wait forever"""
+        if self.release.is_set():
+            self.join()
+        else:
+            self.stop()
+
+
+def fallback_move(
+    moves: List[dict], tt: Optional[TranspositionTable] = None
+) -> str:
+    """Move after moves from the start position for a search that failed,
+    the best one in tt if it is legal, else the first legal move
+
+    The position is set up anew, the failed search may have left its own
+    board mid-move.
+    """
+    from game import Chess
+    from components import indices_to_uci_str
+
+    chess = Chess()
+    chess.play(moves)
+    player, other_player = chess.players()
+    legal = player.get_possible_moves_index(chess.board, other_player)
+    if not legal:
+        return "0000"
+    if tt is not None:
+        entry = tt.probe(player.position_key(chess.board))
+        if entry and entry[3]:
+            best = player.get_pseudo_legal_move(
+                chess.board, other_player, entry[3]
+            )
+            if best in legal:
+                return indices_to_uci_str(*best)
+    return indices_to_uci_str(*legal[0])
+
+
+def is_move(token: str) -> bool:
+    try:
+        position_valid_or_raise(token)
+    except ValueError:
+        return False
+    return True
+
+
 def position_valid_or_raise(pos: str):
 
     # Promote
@@ -83,8 +239,47 @@ def parse_command(cmd, state: dict) -> Tuple[bool, Union[List[dict], bool]]:
         case ["uci"]:
             state["last"] = "uci"
             uci(f"id name {ENGINE_NAME}")
+            for name, option in OPTIONS.items():
+                if "check" == option["type"]:
+                    uci(
+                        "option name {} type check default {}".format(
+                            name, str(option["default"]).lower()
+                        )
+                    )
+                    continue
+                uci(
+                    "option name {} type {} default {} min {} max {}".format(
+                        name,
+                        option["type"],
+                        option["default"],
+                        option["min"],
+                        option["max"],
+                    )
+                )
             uci("uciok")
 
+        # Values out of range are clamped, invalid ones ignored
+        case ["setoption", "name", name, "value", value]:
+            option = OPTIONS.get(name)
+            if option is None:
+                log.warning(f'unknown option "{name}"')
+            elif "check" == option["type"]:
+                if value.lower() in ("true", "false"):
+                    state.setdefault("options", {})[name] = (
+                        "true" == value.lower()
+                    )
+                else:
+                    log.warning(f'invalid value "{value}" for "{name}"')
+            else:
+                try:
+                    number = int(value)
+                except ValueError:
+                    log.warning(f'invalid value "{value}" for "{name}"')
+                else:
+                    state.setdefault("options", {})[name] = min(
+                        max(number, option["min"]), option["max"]
+                    )
+
         # for synchronizing after long running commands
         case ["isready"]:
             if "go" == state["last"]:
@@ -94,7 +289,7 @@ def parse_command(cmd, state: dict) -> Tuple[bool, Union[List[dict], bool]]:
         # default start position
         case ["position", "startpos"]:
             state["last"] = "position"
-            pass
+            return (False, [])
 
         # default start position plus moves
         case ["position", "startpos", "moves", *moves]:
@@ -121,8 +316,17 @@ def parse_command(cmd, state: dict) -> Tuple[bool, Union[List[dict], bool]]:
 
         case ["go", *args]:
             state["last"] = "go"
-            moves = iter(args)
             state["ponderhit"] = False
+            state.update(GO_DEFAULTS)
+            # searchmoves takes all the moves that follow it
+            if "searchmoves" in args:
+                start = args.index("searchmoves")
+                end = start + 1
+                while end < len(args) and is_move(args[end]):
+                    end += 1
+                state["searchmoves"] = args[start + 1 : end]
+                args = args[:start] + args[end:]
+            moves = iter(args)
             try:
                 while True:
                     token = next(moves)
@@ -137,8 +341,8 @@ def parse_command(cmd, state: dict) -> Tuple[bool, Union[List[dict], bool]]:
             except StopIteration:
                 pass
 
-            # If ponder, do not send bestmove, wait for ponderhit
-            return (not state["ponder"], False)
+            # Pondering, main() holds bestmove back until ponderhit or stop
+            return (True, False)
 
         # custom start position
         case ["position", "fen", pos]:
@@ -146,14 +350,20 @@ def parse_command(cmd, state: dict) -> Tuple[bool, Union[List[dict], bool]]:
 
         case ["ucinewgame"]:
             parse_command.started = False
+            state["newgame"] = True
 
-        # Search for move using the last position sent by "go ponder"
+        # The ponder search goes on, timed from now; main() tells it
         case ["ponderhit"]:
             state["last"] = "ponderhit"
-            return (True, False)
 
+        # The search is stopped by main(), which owns it
+        case ["stop"]:
+            state["last"] = "stop"
+
+        # main() has stopped the search, it frees the hash table on the way
+        # out
         case ["quit"]:
-            os._exit(0)
+            sys.exit(0)
 
         case _:
             log.warning(f'no matching command found for "{cmd}"')
@@ -163,6 +373,8 @@ def parse_command(cmd, state: dict) -> Tuple[bool, Union[List[dict], bool]]:
 def main():
 
     from game import Chess
+    from components import MoveOrder
+    from mcts import MCTS
 
     bestmove.i = 0
     if not LOG_DIR.is_dir():
@@ -170,17 +382,11 @@ def main():
     log.basicConfig(filename=LOG_FILE, encoding="utf-8", level=log.DEBUG)
     state = {
         "position": "",
-        "wtime": 0,
-        "btime": 0,
-        "winc": 0,
-        "binc": 0,
-        "movestogo": 0,
-        "depth": 0,
-        "nodes": 0,
-        "movetime": 0,
-        "ponder": False,
-        "infinite": False,
+        **GO_DEFAULTS,
         "last": None,
+        "options": {
+            name: option["default"] for name, option in OPTIONS.items()
+        },
     }
     ppid = os.getppid()
     log.info("==================================================")
@@ -188,15 +394,80 @@ def main():
     log.info("==================================================")
     log.info(f"started by parent process: [{ppid}]\n")
     last_position = []
-    while True:
-        line = input()
-
-        (get_move, position) = parse_command(line.strip(), state)
-        if position:
-            last_position = position
-        if get_move:
-            bestmove(Chess().get_best_move(last_position))
-            last_position = []
+    # One game, kept between searches along with what they learned
+    chess = None
+    tt = None
+    order = MoveOrder()
+    tree = MCTS()
+    searcher = None
+    try:
+        while True:
+            line = input().strip()
+
+            # Only one search at a time, a new go waits for the last one
+            if searcher and (
+                line in ("stop", "quit") or line.startswith("go")
+            ):
+                if line.startswith("go"):
+                    searcher.finish()
+                else:
+                    searcher.stop()
+                if searcher.error is not None:
+                    # Start over from the position, not a board left
+                    # mid-search
+                    chess = None
+                    tree.clear()
+                searcher = None
+            if searcher and "ponderhit" == line:
+                searcher.ponderhit()
+
+            (get_move, position) = parse_command(line, state)
+            if state.pop("newgame", False):
+                chess = None
+                order.clear()
+                tree.clear()
+                if tt:
+                    tt.clear()
+            if position is not False:
+                last_position = position
+            if get_move:
+                # (Re)allocate lazily, so several setoptions cost one
+                # allocation. Helper processes need it in shared memory.
+                megabytes = state["options"]["Hash"]
+                shared = state["options"]["Threads"] > 1
+                if (
+                    tt is None
+                    or tt.megabytes != megabytes
+                    or (tt.name is not None) != shared
+                ):
+                    # Free the old table before allocating the new one
+                    if tt:
+                        tt.close()
+                    tt = TranspositionTable(megabytes, shared)
+                # Carry on with the game unless the GUI went elsewhere
+                if chess is None or (
+                    last_position[: len(chess.moves)] != chess.moves
+                ):
+                    chess = Chess()
+                searcher = SearchThread(
+                    partial(
+                        chess.get_best_move,
+                        last_position[len(chess.moves) :],
+                        dict(state),
+                        tt,
+                        order,
+                        tree=tree,
+                    ),
+                    wait=state["ponder"] or state["infinite"],
+                    fallback=partial(fallback_move, list(last_position), tt),
+                )
+                searcher.start()
+    finally:
+        # Out of input, let the last search finish
+        if searcher:
+            searcher.finish()
+        if tt:
+            tt.close()
 
 
 if "__main__" == __name__: